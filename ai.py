@@ -0,0 +1,320 @@
+"""电脑对手：迭代加深的负极大值 alpha-beta 搜索"""
+import time
+
+from engine import ROWS, COLS, PieceType, opponent, is_den, is_trap
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# 胜负分值；距离越近的胜利分数越高
+MATE = 100000
+MATE_BOUND = MATE - 1000
+INFINITY = MATE + 1
+
+# 子力价值：老鼠能吃象、能下河，价值高于其等级
+PIECE_VALUES = {
+    PieceType.ELEPHANT: 1000,
+    PieceType.LION: 900,
+    PieceType.TIGER: 800,
+    PieceType.LEOPARD: 450,
+    PieceType.WOLF: 350,
+    PieceType.DOG: 300,
+    PieceType.CAT: 250,
+    PieceType.RAT: 500,
+}
+
+# 每接近对方兽穴一步的加分
+ADVANCE_BONUS = 8
+
+DEN_POS = {'red': (8, 3), 'blue': (0, 3)}
+
+
+def _den_neighbours(player):
+    row, col = DEN_POS[player]
+    return {(r, c) for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1))
+            if 0 <= r < ROWS and 0 <= c < COLS}
+
+
+# 对方兽穴周围的格子：走到这里就是直接的兽穴威胁
+DEN_THREATS = {'red': _den_neighbours('blue'), 'blue': _den_neighbours('red')}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    def __init__(self, move, score, depth, nodes, elapsed):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f'SearchResult(move={self.move}, score={self.score}, depth={self.depth}, '
+                f'nodes={self.nodes}, elapsed={self.elapsed:.3f})')
+
+
+def evaluate(state):
+    """从当前行棋方角度给局面打分"""
+    score = 0
+    for player in ('red', 'blue'):
+        den_row, den_col = DEN_POS[opponent(player)]
+        total = 0
+        for piece in state.piece_lists[player]:
+            row, col = piece.pos
+            total += PIECE_VALUES[piece.type]
+            total += ADVANCE_BONUS * (14 - abs(row - den_row) - abs(col - den_col))
+        score += total if player == state.current_player else -total
+    return score
+
+
+class AlphaBetaSearcher:
+    """负极大值 alpha-beta 搜索，带置换表、杀手着法与历史启发；可选用开局库（book.OpeningBook）与残局库（tablebase.Tablebase）"""
+
+    def __init__(self, tt_size_mb=16, max_depth=64, tablebase=None, book=None):
+        self.tt = TranspositionTable(tt_size_mb)
+        self.max_depth = max_depth
+        self.tablebase = tablebase
+        self.book = book
+        self.history = {}
+        self.killers = []
+        self.nodes = 0
+        self.deadline = None
+        self.state = None
+        self.path = []
+
+    def search(self, state, time_ms=1000, max_depth=None):
+        """在给定时间（毫秒）内搜索最佳着法，不修改传入的局面"""
+        start = time.perf_counter()
+        self.deadline = start + time_ms / 1000
+        self.state = state.copy()
+        self.nodes = 0
+        self.history = {}
+        self.killers = [[None, None] for _ in range(self.max_depth + 64)]
+        self.path = []
+        max_depth = min(max_depth or self.max_depth, self.max_depth)
+
+        moves = self.state.legal_moves()
+        if not moves:
+            return SearchResult(None, -MATE, 0, 0, 0.0)
+        # 开局库与残局库中的局面直接查表
+        if self.book:
+            move = self.book.choose(self.state)
+            if move:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start)
+        if self.tablebase:
+            move = self.tablebase.best_move(self.state)
+            if move:
+                return SearchResult(move, self._tablebase_score(0), 0, 0, time.perf_counter() - start)
+        # 保证超时时也有着法可走
+        result = SearchResult(self._order(moves, None, 0)[0], 0, 0, 0, 0.0)
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._root(depth)
+            except SearchTimeout:
+                break
+            result = SearchResult(move, score, depth, self.nodes, time.perf_counter() - start)
+            # 已找到必胜或必败的着法，不需要再加深
+            if abs(score) >= MATE_BOUND:
+                break
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def _root(self, depth):
+        state = self.state
+        entry = self.tt.probe(state.hash)
+        tt_move = entry[3] if entry else None
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        self.path.append(state.hash)
+        for move in self._order(state.legal_moves(), tt_move, 0):
+            token = state.make_move(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                state.unmake_move(token)
+            if score > alpha or best_move is None:
+                alpha = score
+                best_move = move
+        self.path.pop()
+        self.tt.store(state.hash, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        state = self.state
+        # 上一步已经分出胜负，当前行棋方落败
+        if state.winner:
+            return -MATE + ply
+        # 搜索路径上的重复局面按和棋处理
+        if state.hash in self.path:
+            return 0
+        if self.tablebase:
+            score = self._tablebase_score(ply)
+            if score is not None:
+                return score
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        alpha_orig = alpha
+        entry = self.tt.probe(state.hash)
+        tt_move = None
+        if entry:
+            entry_depth, entry_score, flag, tt_move = entry
+            if entry_depth >= depth:
+                entry_score = _score_from_tt(entry_score, ply)
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                elif flag == UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        moves = state.legal_moves()
+        if not moves:
+            return -MATE + ply
+
+        best_score = -INFINITY
+        best_move = None
+        self.path.append(state.hash)
+        board = state.board
+        for move in self._order(moves, tt_move, ply):
+            token = state.make_move(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                state.unmake_move(token)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                to_row, to_col = move[1]
+                if board[to_row][to_col] is None:
+                    self._record_cutoff(move, depth, ply)
+                break
+        self.path.pop()
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(state.hash, depth, _score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _tablebase_score(self, ply):
+        """残局库中的局面返回精确分值：胜负按到终局的步数换算成杀棋分，和棋为0"""
+        probe = self.tablebase.probe(self.state)
+        if probe is None:
+            return None
+        result, distance = probe
+        if result == 'win':
+            return MATE - ply - distance
+        if result == 'loss':
+            return -MATE + ply + distance
+        return 0
+
+    def _quiesce(self, alpha, beta, ply):
+        """静态搜索：只展开吃子和进入兽穴的着法，避免在交换途中停止"""
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        state = self.state
+        if state.winner:
+            return -MATE + ply
+        stand_pat = evaluate(state)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        board = state.board
+        enemy = opponent(state.current_player)
+        tactical = []
+        for move in state.legal_moves():
+            to_row, to_col = move[1]
+            if board[to_row][to_col] is not None or is_den(to_row, to_col, enemy):
+                tactical.append(move)
+        for move in self._order(tactical, None, ply):
+            token = state.make_move(move)
+            try:
+                score = -self._quiesce(-beta, -alpha, ply + 1)
+            finally:
+                state.unmake_move(token)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order(self, moves, tt_move, ply):
+        """着法排序：置换表着法、进兽穴、吃子（大吃小优先）、兽穴威胁、杀手着法、历史得分"""
+        state = self.state
+        board = state.board
+        player = state.current_player
+        enemy = opponent(player)
+        threats = DEN_THREATS[player]
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                scored.append((10000000, move))
+                continue
+            (from_row, from_col), to_pos = move
+            to_row, to_col = to_pos
+            target = board[to_row][to_col]
+            if is_den(to_row, to_col, enemy):
+                score = 9000000
+            elif target is not None:
+                attacker = board[from_row][from_col]
+                score = 5000000 + PIECE_VALUES[target.type] * 10 - PIECE_VALUES[attacker.type] // 10
+            elif to_pos in threats or is_trap(to_row, to_col, enemy):
+                score = 4000000
+            elif move == killers[0]:
+                score = 3000000
+            elif move == killers[1]:
+                score = 2900000
+            else:
+                score = history.get((player, move), 0)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _record_cutoff(self, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        key = (self.state.current_player, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+
+def _score_to_tt(score, ply):
+    # 胜负分数按“距当前节点的步数”存储，取出时再换算回根节点
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def find_best_move(state, time_ms=1000, max_depth=None, tt_size_mb=16):
+    """库函数：返回当前行棋方在限定时间内搜索到的最佳着法"""
+    searcher = AlphaBetaSearcher(tt_size_mb=tt_size_mb)
+    return searcher.search(state, time_ms=time_ms, max_depth=max_depth).move
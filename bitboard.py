@@ -0,0 +1,234 @@
+"""斗兽棋位棋盘表示：整个9x7棋盘的每个集合都用一个整数表示
+
+方格编号 sq = row * 7 + col，第 sq 位为1表示该格被占据。
+着法用 (起点方格, 终点方格) 表示。
+"""
+from engine import ROWS, COLS, JUMP_TABLE, PieceType, Piece, GameState, is_river, is_den, is_trap
+
+SQUARES = ROWS * COLS
+FULL = (1 << SQUARES) - 1
+
+RED = 0
+BLUE = 1
+SIDES = ('red', 'blue')
+
+RAT = PieceType.RAT.value
+TIGER = PieceType.TIGER.value
+LION = PieceType.LION.value
+
+
+def square(row, col):
+    return row * COLS + col
+
+
+def position(sq):
+    return divmod(sq, COLS)
+
+
+def _mask(predicate):
+    m = 0
+    for row in range(ROWS):
+        for col in range(COLS):
+            if predicate(row, col):
+                m |= 1 << square(row, col)
+    return m
+
+
+# 预计算的区域掩码
+RIVER = _mask(is_river)
+LAND = FULL & ~RIVER
+DEN = (_mask(lambda r, c: is_den(r, c, 'red')), _mask(lambda r, c: is_den(r, c, 'blue')))
+TRAP = (_mask(lambda r, c: is_trap(r, c, 'red')), _mask(lambda r, c: is_trap(r, c, 'blue')))
+NOT_COL0 = _mask(lambda r, c: c != 0)
+NOT_COL6 = _mask(lambda r, c: c != COLS - 1)
+
+
+def _build_eats():
+    # 直接用 Piece.can_capture 推导吃子关系（放在中立格子上，不受陷阱影响）
+    eats = [() for _ in range(9)]
+    for attacker in PieceType:
+        targets = []
+        for defender in PieceType:
+            a = Piece(attacker, 'red', (4, 0))
+            d = Piece(defender, 'blue', (4, 6))
+            if a.can_capture(d, None):
+                targets.append(defender.value)
+        eats[attacker.value] = tuple(targets)
+    return eats
+
+
+# EATS[t]：在正常情况下类型 t 能吃掉的对方棋子类型
+EATS = _build_eats()
+
+
+def _build_jumps():
+    # JUMPS[sq]：狮虎从 sq 跳河的 (终点, 途经河流掩码)，由引擎的跳河表转换而来
+    jumps = [() for _ in range(SQUARES)]
+    for row in range(ROWS):
+        for col in range(COLS):
+            result = []
+            for (target_row, target_col), path in JUMP_TABLE[row][col]:
+                path_mask = 0
+                for r, c in path:
+                    path_mask |= 1 << square(r, c)
+                result.append((square(target_row, target_col), path_mask))
+            jumps[square(row, col)] = tuple(result)
+    return jumps
+
+
+JUMPS = _build_jumps()
+
+
+class BitBoard:
+    """用整数掩码表示的局面，适合搜索与批量模拟"""
+
+    __slots__ = ('pieces', 'occ', 'side', 'winner')
+
+    def __init__(self):
+        # pieces[side][type.value]：该方该类型棋子的占位掩码
+        self.pieces = [[0] * 9, [0] * 9]
+        self.occ = [0, 0]
+        self.side = RED
+        self.winner = None
+
+    @classmethod
+    def from_state(cls, state):
+        bb = cls()
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = state.board[row][col]
+                if piece:
+                    side = SIDES.index(piece.player)
+                    bit = 1 << square(row, col)
+                    bb.pieces[side][piece.type.value] |= bit
+                    bb.occ[side] |= bit
+        bb.side = SIDES.index(state.current_player)
+        if state.winner:
+            bb.winner = SIDES.index(state.winner)
+        return bb
+
+    def to_state(self):
+        state = GameState(setup=False)
+        for side in (RED, BLUE):
+            for t in range(1, 9):
+                m = self.pieces[side][t]
+                while m:
+                    lsb = m & -m
+                    row, col = position(lsb.bit_length() - 1)
+                    state.board[row][col] = Piece(PieceType(t), SIDES[side], (row, col))
+                    m ^= lsb
+        state.current_player = SIDES[self.side]
+        state.rebuild()
+        return state
+
+    def copy(self):
+        bb = BitBoard()
+        bb.pieces = [self.pieces[0][:], self.pieces[1][:]]
+        bb.occ = self.occ[:]
+        bb.side = self.side
+        bb.winner = self.winner
+        return bb
+
+    def key(self):
+        """局面的可哈希表示（各类型掩码加行棋方）"""
+        return (tuple(self.pieces[RED]), tuple(self.pieces[BLUE]), self.side)
+
+    def type_at(self, side, sq):
+        bit = 1 << sq
+        pieces = self.pieces[side]
+        for t in range(1, 9):
+            if pieces[t] & bit:
+                return t
+        return 0
+
+    def legal_moves(self):
+        """生成当前行棋方的全部合法着法"""
+        if self.winner is not None:
+            return []
+        s = self.side
+        o = 1 - s
+        own_pieces = self.pieces[s]
+        enemy_pieces = self.pieces[o]
+        enemy = self.occ[o]
+        empty = FULL & ~(self.occ[s] | enemy)
+        rats = own_pieces[RAT] | enemy_pieces[RAT]
+        # 落入己方陷阱的对方棋子战斗力为0，任何棋子都能吃
+        trapped_enemy = enemy & TRAP[s]
+        enemy_trap = TRAP[o]
+        land_ok = LAND & ~DEN[s]
+        water_ok = FULL & ~DEN[s]
+
+        moves = []
+        for t in range(1, 9):
+            bb = own_pieces[t]
+            if not bb:
+                continue
+            area = water_ok if t == RAT else land_ok
+            eat = trapped_enemy
+            for d in EATS[t]:
+                eat |= enemy_pieces[d]
+            # 身处对方陷阱的棋子战斗力为0，只能吃掉落入己方陷阱的棋子
+            trapped = bb & enemy_trap
+            if trapped:
+                groups = ((bb ^ trapped, eat), (trapped, trapped_enemy))
+            else:
+                groups = ((bb, eat),)
+            for src, capt in groups:
+                if not src:
+                    continue
+                dest_ok = area & (empty | capt)
+                # 上下左右四个方向整体移位，终点减去位移即得起点
+                m = (src >> COLS) & dest_ok
+                while m:
+                    lsb = m & -m
+                    to = lsb.bit_length() - 1
+                    moves.append((to + COLS, to))
+                    m ^= lsb
+                m = (src << COLS) & dest_ok
+                while m:
+                    lsb = m & -m
+                    to = lsb.bit_length() - 1
+                    moves.append((to - COLS, to))
+                    m ^= lsb
+                m = ((src & NOT_COL6) << 1) & dest_ok
+                while m:
+                    lsb = m & -m
+                    to = lsb.bit_length() - 1
+                    moves.append((to - 1, to))
+                    m ^= lsb
+                m = ((src & NOT_COL0) >> 1) & dest_ok
+                while m:
+                    lsb = m & -m
+                    to = lsb.bit_length() - 1
+                    moves.append((to + 1, to))
+                    m ^= lsb
+                if t == LION or t == TIGER:
+                    m = src
+                    while m:
+                        lsb = m & -m
+                        frm = lsb.bit_length() - 1
+                        for to, path in JUMPS[frm]:
+                            if not path & rats and (1 << to) & dest_ok:
+                                moves.append((frm, to))
+                        m ^= lsb
+        return moves
+
+    def play(self, move):
+        """原地执行着法，返回被吃棋子的类型值（没有吃子返回0）"""
+        frm, to = move
+        s = self.side
+        o = 1 - s
+        t = self.type_at(s, frm)
+        to_bit = 1 << to
+        move_bits = (1 << frm) | to_bit
+        self.pieces[s][t] ^= move_bits
+        self.occ[s] ^= move_bits
+        captured = 0
+        if self.occ[o] & to_bit:
+            captured = self.type_at(o, to)
+            self.pieces[o][captured] ^= to_bit
+            self.occ[o] ^= to_bit
+        if to_bit & DEN[o] or not self.occ[o]:
+            self.winner = s
+        self.side = o
+        return captured
@@ -0,0 +1,187 @@
+"""开局库：从棋谱统计开局阶段每个局面的着法，写成按局面哈希排序的二进制文件
+
+文件结构（整数均为小端）：
+    文件头 12 字节：b'DSQB'、版本号（1字节）、3字节保留、条目数（4字节）
+    条目按 (局面哈希, 着法) 升序排列，每条 18 字节：
+        局面哈希（8字节，GameState.hash）、着法（2字节，编码同 record.encode_move）、
+        对局数（4字节）、得分（4字节，行棋方每胜一局记2分、和一局记1分）
+查询时把文件映射到内存，按哈希二分查找，不需要在启动时解析整个开局库。
+
+用法示例：
+    python book.py games.dsq archive/ --plies 16 --min-games 3 --out opening.dsqb
+    python book.py --probe 'l5t/1d3c1/r1p1w1e/7/7/7/E1W1P1R/1C3D1/T5L r' --book opening.dsqb
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+
+from engine import GameState
+from record import encode_move, decode_move
+from replay import iter_games, IllegalMove, iter_positions
+
+MAGIC = b'DSQB'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3xI')
+ENTRY = struct.Struct('<QHII')
+KEY = struct.Struct('<Q')
+
+# 默认只收录每局前这么多步
+DEFAULT_PLIES = 20
+SUFFIX = '.dsqb'
+
+
+class BookMove:
+    __slots__ = ('move', 'games', 'points')
+
+    def __init__(self, move, games, points):
+        self.move = move
+        self.games = games
+        self.points = points
+
+    @property
+    def score(self):
+        """行棋方的得分率（0到1）"""
+        return self.points / (2 * self.games) if self.games else 0.0
+
+    @property
+    def weight(self):
+        # 常走且得分高的着法更容易被选中；得分率加了平滑，只出现过一两次的着法不会被放大
+        return self.games * (self.points + 1) / (2 * self.games + 2)
+
+    def __repr__(self):
+        return f'BookMove(move={self.move}, games={self.games}, score={self.score:.3f})'
+
+
+def collect(records, plies=DEFAULT_PLIES):
+    """统计每个 (局面哈希, 着法) 的对局数与得分；着法不合法的对局从出错处起不再统计
+
+    没有结果的对局（如中途退出时保存的）不知道得分，整局不计入。
+    """
+    stats = {}
+    for record in records:
+        result = record.result
+        if result is None:
+            continue
+        try:
+            for _, ply, state, move, _, _ in iter_positions((record,)):
+                if ply >= plies:
+                    break
+                if result == state.current_player:
+                    points = 2
+                elif result == 'draw':
+                    points = 1
+                else:
+                    points = 0
+                key = (state.hash, encode_move(move))
+                entry = stats.get(key)
+                if entry is None:
+                    stats[key] = [1, points]
+                else:
+                    entry[0] += 1
+                    entry[1] += points
+        except IllegalMove:
+            continue
+    return stats
+
+
+def write_book(stats, out, min_games=1):
+    """把统计结果排序后写入开局库文件，返回写入的条目数"""
+    keys = sorted(key for key, (games, _) in stats.items() if games >= min_games)
+    with open(out, 'wb') as f:
+        f.write(FILE_HEADER.pack(MAGIC, VERSION, len(keys)))
+        f.write(b''.join(ENTRY.pack(h, code, *stats[(h, code)]) for h, code in keys))
+    return len(keys)
+
+
+class OpeningBook:
+    """只读的开局库；条目通过 mmap 按需读取"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} 不是开局库文件')
+        if version != VERSION:
+            raise ValueError(f'不支持的开局库版本：{version}')
+        if FILE_HEADER.size + self.count * ENTRY.size > len(self.data):
+            raise ValueError(f'{path} 被截断')
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _key(self, i):
+        return KEY.unpack_from(self.data, FILE_HEADER.size + i * ENTRY.size)[0]
+
+    def probe(self, state):
+        """返回该局面在库中的合法着法（BookMove 列表），不在库中时返回空列表"""
+        h = state.hash
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        result = []
+        offset = FILE_HEADER.size + lo * ENTRY.size
+        end = FILE_HEADER.size + self.count * ENTRY.size
+        while offset < end:
+            key, code, games, points = ENTRY.unpack_from(self.data, offset)
+            if key != h:
+                break
+            result.append(BookMove(decode_move(code), games, points))
+            offset += ENTRY.size
+        if result:
+            # 哈希碰撞时着法可能不合法
+            legal = set(state.legal_moves())
+            result = [entry for entry in result if entry.move in legal]
+        return result
+
+    def choose(self, state, rng=random):
+        """按权重随机选一个开局库着法，局面不在库中时返回None"""
+        moves = self.probe(state)
+        if not moves:
+            return None
+        return rng.choices(moves, weights=[m.weight for m in moves])[0].move
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从棋谱生成斗兽棋开局库')
+    parser.add_argument('paths', nargs='*', help='棋谱文件或包含棋谱的目录')
+    parser.add_argument('--plies', type=int, default=DEFAULT_PLIES, help='每局收录的步数')
+    parser.add_argument('--min-games', type=int, default=2, help='至少出现在这么多局中的着法才收录')
+    parser.add_argument('--out', default='opening' + SUFFIX, help='输出文件')
+    parser.add_argument('--book', help='查询时使用的开局库文件')
+    parser.add_argument('--probe', help='查询一个局面（GameState.to_text 格式）')
+    args = parser.parse_args()
+
+    if args.probe:
+        with OpeningBook(args.book or args.out) as book:
+            for entry in sorted(book.probe(GameState.from_text(args.probe)), key=lambda m: -m.games):
+                print(entry)
+        return
+    if not args.paths:
+        parser.error('需要棋谱文件或 --probe')
+
+    stats = collect(iter_games(args.paths), args.plies)
+    count = write_book(stats, args.out, args.min_games)
+    print(f'局面着法 {len(stats)} 个，收录 {count} 个，写入 {args.out}'
+          f'（{os.path.getsize(args.out) / 1024:.1f} KB）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""把界面用到的图片缩放后拼成一张图集（images/atlas.png 与 images/atlas.json）
+
+启动时解码一张小图集比逐个解码十几张大尺寸 PNG 快得多。修改了 images/ 下的图片后
+重新运行本工具；打包（animalchess.spec）前也应先运行一次。
+
+用法：
+    python build_atlas.py
+"""
+import argparse
+import json
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+
+from utils import ATLAS_IMAGE, ATLAS_INDEX, ATLAS_TILE, ATLAS_VERSION
+
+# 图集中的图片（images/ 下的文件名，不含扩展名）
+ATLAS_NAMES = ['elephant', 'lion', 'tiger', 'leopard', 'wolf', 'dog', 'cat', 'rat',
+               'trap', 'den', 'water', 'tile']
+COLUMNS = 4
+
+
+def build_atlas(names=ATLAS_NAMES, tile=ATLAS_TILE, image_out=ATLAS_IMAGE, index_out=ATLAS_INDEX):
+    rows = (len(names) + COLUMNS - 1) // COLUMNS
+    sheet = pygame.Surface((COLUMNS * tile, rows * tile), pygame.SRCALPHA)
+    sprites = {}
+    for i, name in enumerate(names):
+        image = pygame.image.load(os.path.join('images', f'{name}.png'))
+        x, y = (i % COLUMNS) * tile, (i // COLUMNS) * tile
+        sheet.blit(pygame.transform.smoothscale(image, (tile, tile)), (x, y))
+        sprites[name] = [x, y, tile, tile]
+    pygame.image.save(sheet, image_out)
+    with open(index_out, 'w', encoding='utf-8') as f:
+        json.dump({'version': ATLAS_VERSION, 'tile': tile, 'sprites': sprites}, f, indent=1)
+    return sprites
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成界面图片的图集')
+    parser.add_argument('--tile', type=int, default=ATLAS_TILE, help='每张图片缩放后的边长（像素）')
+    args = parser.parse_args()
+    sprites = build_atlas(tile=args.tile)
+    print(f'{len(sprites)} 张图片写入 {ATLAS_IMAGE}（{os.path.getsize(ATLAS_IMAGE) / 1024:.1f} KB）')
+
+
+if __name__ == '__main__':
+    main()
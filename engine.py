@@ -0,0 +1,534 @@
+"""斗兽棋规则引擎（不依赖pygame，可在无显示环境下批量使用）"""
+import random
+from enum import Enum
+
+# 棋盘尺寸：9行7列
+ROWS = 9
+COLS = 7
+
+PLAYERS = ('red', 'blue')
+
+
+# 定义棋子类型
+class PieceType(Enum):
+    ELEPHANT = 8
+    LION = 7
+    TIGER = 6
+    LEOPARD = 5
+    WOLF = 4
+    DOG = 3
+    CAT = 2
+    RAT = 1
+
+
+# 棋子中文名称
+PIECE_NAMES = {
+    PieceType.ELEPHANT: '象',
+    PieceType.LION: '狮',
+    PieceType.TIGER: '虎',
+    PieceType.LEOPARD: '豹',
+    PieceType.WOLF: '狼',
+    PieceType.DOG: '狗',
+    PieceType.CAT: '猫',
+    PieceType.RAT: '鼠'
+}
+
+
+# 局面文本中使用的棋子字母：红方大写、蓝方小写
+PIECE_LETTERS = {
+    PieceType.ELEPHANT: 'E',
+    PieceType.LION: 'L',
+    PieceType.TIGER: 'T',
+    PieceType.LEOPARD: 'P',
+    PieceType.WOLF: 'W',
+    PieceType.DOG: 'D',
+    PieceType.CAT: 'C',
+    PieceType.RAT: 'R'
+}
+LETTER_PIECES = {letter: piece_type for piece_type, letter in PIECE_LETTERS.items()}
+
+
+def opponent(player):
+    """返回对手的颜色"""
+    return 'blue' if player == 'red' else 'red'
+
+
+def is_river(row, col):
+    """判断是否为河流格子"""
+    return (3 <= row <= 5) and (col in [1, 2, 4, 5])
+
+
+def is_den(row, col, player):
+    """判断是否为指定玩家的兽穴"""
+    if player == 'red':
+        return row == 8 and col == 3
+    else:
+        return row == 0 and col == 3
+
+
+def is_trap(row, col, player):
+    """判断是否为指定玩家一方的陷阱"""
+    if player == 'red':
+        return (row == 8 and col == 2) or \
+               (row == 8 and col == 4) or \
+               (row == 7 and col == 3)
+    else:
+        return (row == 0 and col == 2) or \
+               (row == 0 and col == 4) or \
+               (row == 1 and col == 3)
+
+
+# 走法类别：老鼠（可下河）、狮虎（可跳河）、其他棋子
+MOVE_RAT = 0
+MOVE_JUMP = 1
+MOVE_OTHER = 2
+
+
+def move_class(piece_type):
+    if piece_type == PieceType.RAT:
+        return MOVE_RAT
+    if piece_type in (PieceType.LION, PieceType.TIGER):
+        return MOVE_JUMP
+    return MOVE_OTHER
+
+
+def _build_jump_table():
+    # JUMP_TABLE[row][col]：从该格跳河的 ((终点), (途经的河流格子...)) 列表
+    table = [[() for _ in range(COLS)] for _ in range(ROWS)]
+    for row in range(ROWS):
+        for col in range(COLS):
+            # 起点不能在河中
+            if is_river(row, col):
+                continue
+            jumps = []
+            # 纵向跳4格（中间3格河流），横向跳3格（中间2格河流）
+            for dr, dc, length in ((1, 0, 4), (-1, 0, 4), (0, 1, 3), (0, -1, 3)):
+                target_row, target_col = row + dr * length, col + dc * length
+                if not (0 <= target_row < ROWS and 0 <= target_col < COLS):
+                    continue
+                if is_river(target_row, target_col):
+                    continue
+                path = tuple((row + dr * i, col + dc * i) for i in range(1, length))
+                if all(is_river(r, c) for r, c in path):
+                    jumps.append(((target_row, target_col), path))
+            table[row][col] = tuple(jumps)
+    return table
+
+
+def _build_move_tables():
+    # MOVE_TABLES[player][类别][row][col]：{目标位置: 途经的河流格子}，普通移动的途经为空
+    tables = {}
+    for player in PLAYERS:
+        tables[player] = []
+        for cls in (MOVE_RAT, MOVE_JUMP, MOVE_OTHER):
+            grid = [[None for _ in range(COLS)] for _ in range(ROWS)]
+            for row in range(ROWS):
+                for col in range(COLS):
+                    targets = {}
+                    for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                        target_row, target_col = row + dr, col + dc
+                        if not (0 <= target_row < ROWS and 0 <= target_col < COLS):
+                            continue
+                        # 只有老鼠能下河
+                        if is_river(target_row, target_col) and cls != MOVE_RAT:
+                            continue
+                        # 不能进入己方兽穴
+                        if is_den(target_row, target_col, player):
+                            continue
+                        targets[(target_row, target_col)] = ()
+                    if cls == MOVE_JUMP:
+                        for target, path in JUMP_TABLE[row][col]:
+                            if not is_den(target[0], target[1], player):
+                                targets[target] = path
+                    grid[row][col] = targets
+            tables[player].append(grid)
+    return tables
+
+
+JUMP_TABLE = _build_jump_table()
+MOVE_TABLES = _build_move_tables()
+
+
+def _build_zobrist():
+    # 固定种子，保证不同进程、不同次运行得到相同的哈希值
+    rng = random.Random(0x5D0C)
+    keys = {}
+    for player in PLAYERS:
+        for piece_type in PieceType:
+            keys[(piece_type, player)] = [[rng.getrandbits(64) for _ in range(COLS)] for _ in range(ROWS)]
+    return keys, rng.getrandbits(64)
+
+
+# ZOBRIST_KEYS[(棋子类型, 玩家)][row][col]：64位Zobrist键；轮到蓝方时再异或 ZOBRIST_SIDE
+ZOBRIST_KEYS, ZOBRIST_SIDE = _build_zobrist()
+
+
+# 定义棋子类
+class Piece:
+    # 只保存规则需要的数据；界面的选中状态由界面自己记录
+    __slots__ = ('type', 'player', 'pos', 'move_table', 'zobrist_keys')
+
+    def __init__(self, piece_type, player, pos):
+        self.type = piece_type
+        self.player = player  # 'red' or 'blue'
+        self.pos = pos  # (row, col)
+        # 该棋子的走法表（按所在格子查询候选目标）
+        self.move_table = MOVE_TABLES[player][move_class(piece_type)]
+        self.zobrist_keys = ZOBRIST_KEYS[(piece_type, player)]
+
+    def candidate_moves(self):
+        """返回 {目标位置: 途经的河流格子}，尚未考虑棋盘上的棋子"""
+        row, col = self.pos
+        return self.move_table[row][col]
+
+    def can_move(self, target_pos, board):
+        row, col = self.pos
+        path = self.move_table[row][col].get(target_pos)
+        if path is None:
+            return False
+
+        # 检查目标位置是否有己方棋子
+        target_row, target_col = target_pos
+        target_piece = board[target_row][target_col]
+        if target_piece is not None and target_piece.player == self.player:
+            return False
+
+        # 狮虎跳河时检查是否有老鼠阻挡
+        for r, c in path:
+            if board[r][c] is not None and board[r][c].type == PieceType.RAT:
+                return False
+
+        return True
+
+    def can_capture(self, target_piece, board):
+        # 检查是否在对方陷阱中
+        target_row, target_col = target_piece.pos
+        if target_piece._is_trap(target_row, target_col, self.player):
+            return True  # 在对方陷阱中的棋子可以被任意棋子吃掉，因为其战斗力变为0
+
+        # 检查自己是否在对方陷阱中
+        row, col = self.pos
+        if self._is_trap(row, col, target_piece.player):
+            return False  # 在对方陷阱中的棋子战斗力为0，无法吃掉其他棋子
+
+        # 老鼠可以吃大象
+        if self.type == PieceType.RAT and target_piece.type == PieceType.ELEPHANT:
+            return True
+        # 大象不能吃老鼠
+        if self.type == PieceType.ELEPHANT and target_piece.type == PieceType.RAT:
+            return False
+        # 其他情况下，大的可以吃小的
+        return self.type.value >= target_piece.type.value
+
+    def _is_river(self, row, col):
+        return is_river(row, col)
+
+    def _is_den(self, row, col, player):
+        return is_den(row, col, player)
+
+    def _is_trap(self, row, col, player):
+        return is_trap(row, col, player)
+
+
+# 紧凑局面中每格一个字节：0 为空，否则为棋子等级，蓝方棋子再加上 BLUE_FLAG
+BLUE_FLAG = 0x10
+_CODE_PIECES = {piece_type.value | (BLUE_FLAG if player == 'blue' else 0): (piece_type, player)
+                for piece_type in PieceType for player in PLAYERS}
+# 格子下标对应的 (行, 列)，恢复局面时所有棋子共用这些元组
+_SQUARE_POS = [divmod(index, COLS) for index in range(ROWS * COLS)]
+
+
+class Position:
+    """紧凑的局面快照：63 字节的棋盘（每格一字节）加行棋方
+
+    不可变、可哈希，复制只是复制引用，适合在搜索树、复盘缓冲区中大量保存。
+    GameState.save_state 返回 Position，restore_state 从它恢复。
+    """
+
+    __slots__ = ('squares', 'side')
+
+    def __init__(self, squares, side='red'):
+        if len(squares) != ROWS * COLS:
+            raise ValueError(f'局面应有{ROWS * COLS}格：{len(squares)}')
+        self.squares = bytes(squares)
+        self.side = side
+
+    @classmethod
+    def from_state(cls, state):
+        squares = bytearray(ROWS * COLS)
+        for player in PLAYERS:
+            flag = BLUE_FLAG if player == 'blue' else 0
+            for piece in state.piece_lists[player]:
+                row, col = piece.pos
+                squares[row * COLS + col] = piece.type.value | flag
+        return cls(squares, state.current_player)
+
+    def to_state(self):
+        state = GameState(setup=False)
+        state.restore_state(self)
+        return state
+
+    def piece_at(self, row, col):
+        """返回 (棋子类型, 玩家)，空格返回None"""
+        return _CODE_PIECES.get(self.squares[row * COLS + col])
+
+    def pieces(self):
+        """依次生成 (棋子类型, 玩家, (行, 列))"""
+        for index, code in enumerate(self.squares):
+            if code:
+                piece_type, player = _CODE_PIECES[code]
+                yield piece_type, player, _SQUARE_POS[index]
+
+    def copy(self):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.squares == other.squares and self.side == other.side
+
+    def __hash__(self):
+        return hash((self.squares, self.side))
+
+    def __repr__(self):
+        return f'Position({self.to_state().to_text()!r})'
+
+
+class GameState:
+    """一局棋的完整状态：棋盘、轮到哪一方、胜负"""
+
+    def __init__(self, setup=True):
+        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        self.current_player = 'red'  # 红方先手
+        self.winner = None
+        # 双方在盘棋子列表，随着法增量更新
+        self.piece_lists = {'red': [], 'blue': []}
+        # 撤销栈：每步着法对应一个 make_move 返回的撤销记录
+        self.history = []
+        # 局面的Zobrist哈希，随着法增量更新
+        self.hash = 0
+        if setup:
+            self.init_pieces()
+
+    def init_pieces(self):
+        # 初始化蓝方棋子
+        self.board[0][0] = Piece(PieceType.LION, 'blue', (0, 0))
+        self.board[0][6] = Piece(PieceType.TIGER, 'blue', (0, 6))
+        self.board[1][1] = Piece(PieceType.DOG, 'blue', (1, 1))
+        self.board[1][5] = Piece(PieceType.CAT, 'blue', (1, 5))
+        self.board[2][0] = Piece(PieceType.RAT, 'blue', (2, 0))
+        self.board[2][2] = Piece(PieceType.LEOPARD, 'blue', (2, 2))
+        self.board[2][4] = Piece(PieceType.WOLF, 'blue', (2, 4))
+        self.board[2][6] = Piece(PieceType.ELEPHANT, 'blue', (2, 6))
+
+        # 初始化红方棋子
+        self.board[8][6] = Piece(PieceType.LION, 'red', (8, 6))
+        self.board[8][0] = Piece(PieceType.TIGER, 'red', (8, 0))
+        self.board[7][5] = Piece(PieceType.DOG, 'red', (7, 5))
+        self.board[7][1] = Piece(PieceType.CAT, 'red', (7, 1))
+        self.board[6][6] = Piece(PieceType.RAT, 'red', (6, 6))
+        self.board[6][4] = Piece(PieceType.LEOPARD, 'red', (6, 4))
+        self.board[6][2] = Piece(PieceType.WOLF, 'red', (6, 2))
+        self.board[6][0] = Piece(PieceType.ELEPHANT, 'red', (6, 0))
+        self.rebuild()
+
+    def rebuild(self):
+        """直接修改 board 之后，重新整理棋子列表、哈希与胜负"""
+        self.piece_lists = {'red': [], 'blue': []}
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece:
+                    self.piece_lists[piece.player].append(piece)
+        self.hash = self.compute_hash()
+        self.winner = self.check_win()
+
+    def compute_hash(self):
+        """从头计算当前局面的Zobrist哈希"""
+        h = ZOBRIST_SIDE if self.current_player == 'blue' else 0
+        for player in PLAYERS:
+            for piece in self.piece_lists[player]:
+                row, col = piece.pos
+                h ^= piece.zobrist_keys[row][col]
+        return h
+
+    def get_piece(self, pos):
+        row, col = pos
+        return self.board[row][col]
+
+    def pieces(self, player=None):
+        """返回棋盘上的棋子（可指定一方）"""
+        if player is not None:
+            return list(self.piece_lists[player])
+        return self.piece_lists['red'] + self.piece_lists['blue']
+
+    def piece_count(self, player):
+        return len(self.piece_lists[player])
+
+    def get_valid_moves(self, piece):
+        """返回某个棋子所有合法的目标位置"""
+        valid_moves = []
+        for target in piece.candidate_moves():
+            if piece.can_move(target, self.board):
+                target_piece = self.board[target[0]][target[1]]
+                if target_piece is None or piece.can_capture(target_piece, self.board):
+                    valid_moves.append(target)
+        return valid_moves
+
+    def legal_moves(self):
+        """返回当前行棋方的所有合法着法，每个着法为 (起点, 终点)"""
+        if self.winner:
+            return []
+        moves = []
+        for piece in self.piece_lists[self.current_player]:
+            for target in self.get_valid_moves(piece):
+                moves.append((piece.pos, target))
+        return moves
+
+    def is_legal_move(self, move):
+        from_pos, to_pos = move
+        if self.winner:
+            return False
+        piece = self.get_piece(from_pos)
+        if piece is None or piece.player != self.current_player:
+            return False
+        if not piece.can_move(to_pos, self.board):
+            return False
+        target_piece = self.get_piece(to_pos)
+        return target_piece is None or piece.can_capture(target_piece, self.board)
+
+    def make_move(self, move):
+        """原地执行着法（不做合法性检查），返回供 unmake_move 使用的撤销记录
+
+        撤销记录只包含着法本身、被吃掉的棋子及其在列表中的位置、走棋前的胜负
+        和哈希，不复制棋盘。
+        """
+        from_pos, to_pos = move
+        old_row, old_col = from_pos
+        row, col = to_pos
+        piece = self.board[old_row][old_col]
+        captured = self.board[row][col]
+        self.board[row][col] = piece
+        self.board[old_row][old_col] = None
+        piece.pos = to_pos
+        enemy = opponent(piece.player)
+        keys = piece.zobrist_keys
+        h = self.hash ^ keys[old_row][old_col] ^ keys[row][col] ^ ZOBRIST_SIDE
+        captured_index = -1
+        if captured is not None:
+            enemy_pieces = self.piece_lists[enemy]
+            captured_index = enemy_pieces.index(captured)
+            del enemy_pieces[captured_index]
+            h ^= captured.zobrist_keys[row][col]
+        token = (from_pos, to_pos, captured, captured_index, self.winner, self.hash)
+        self.history.append(token)
+        self.current_player = enemy
+        self.hash = h
+
+        # 只需检查走到的格子是否为对方兽穴，以及对方是否还有棋子
+        if is_den(row, col, enemy) or not self.piece_lists[enemy]:
+            self.winner = piece.player
+        return token
+
+    def unmake_move(self, token):
+        """撤销 make_move 执行的着法，必须按后进先出的顺序调用"""
+        from_pos, to_pos, captured, captured_index, winner, h = token
+        self.history.pop()
+        row, col = to_pos
+        piece = self.board[row][col]
+        self.board[from_pos[0]][from_pos[1]] = piece
+        self.board[row][col] = captured
+        piece.pos = from_pos
+        if captured is not None:
+            self.piece_lists[captured.player].insert(captured_index, captured)
+        self.current_player = piece.player
+        self.winner = winner
+        self.hash = h
+
+    def apply_move(self, move):
+        """执行着法（不做合法性检查），返回被吃掉的棋子"""
+        return self.make_move(move)[2]
+
+    def last_move(self):
+        return self.history[-1][:2] if self.history else None
+
+    def check_win(self):
+        # 检查是否有一方进入对方兽穴
+        for player in PLAYERS:
+            for piece in self.piece_lists[player]:
+                row, col = piece.pos
+                if is_den(row, col, opponent(player)):
+                    return player
+
+        # 检查是否有一方的棋子全部被吃掉
+        if not self.piece_lists['red']:
+            return 'blue'
+        if not self.piece_lists['blue']:
+            return 'red'
+
+        return None
+
+    def save_state(self):
+        # 保存当前棋盘状态（紧凑的 Position）
+        return Position.from_state(self)
+
+    def restore_state(self, position):
+        # 从 Position 恢复棋盘状态
+        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        for index, code in enumerate(position.squares):
+            if code:
+                piece_type, player = _CODE_PIECES[code]
+                pos = _SQUARE_POS[index]
+                self.board[pos[0]][pos[1]] = Piece(piece_type, player, pos)
+        self.current_player = position.side
+        self.history = []
+        self.rebuild()
+
+    def to_text(self):
+        """把局面写成一行文本：从第0行起逐行列出棋子，数字表示连续空格，最后是行棋方"""
+        rows = []
+        for row in range(ROWS):
+            text = ''
+            empty = 0
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                letter = PIECE_LETTERS[piece.type]
+                text += letter if piece.player == 'red' else letter.lower()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        return '/'.join(rows) + (' r' if self.current_player == 'red' else ' b')
+
+    @classmethod
+    def from_text(cls, text):
+        """从 to_text 的格式恢复局面"""
+        layout, _, side = text.strip().partition(' ')
+        rows = layout.split('/')
+        if len(rows) != ROWS:
+            raise ValueError(f'局面应有{ROWS}行：{text}')
+        state = cls(setup=False)
+        for row, row_text in enumerate(rows):
+            col = 0
+            for ch in row_text:
+                if ch.isdigit():
+                    col += int(ch)
+                    continue
+                if ch.upper() not in LETTER_PIECES or col >= COLS:
+                    raise ValueError(f'无法解析的局面：{text}')
+                player = 'red' if ch.isupper() else 'blue'
+                state.board[row][col] = Piece(LETTER_PIECES[ch.upper()], player, (row, col))
+                col += 1
+            if col != COLS:
+                raise ValueError(f'第{row}行应有{COLS}列：{text}')
+        state.current_player = 'blue' if side == 'b' else 'red'
+        state.rebuild()
+        return state
+
+    def copy(self):
+        new_state = GameState(setup=False)
+        new_state.restore_state(self.save_state())
+        return new_state
@@ -0,0 +1,164 @@
+"""对局日志：界面线程只把精简的记录放进队列，由后台线程格式化并成批写入文件
+
+记录都是元组，第一项为记录类型：
+    ('start', 时间, 红方棋子类型元组, 蓝方棋子类型元组, ((位置, 行棋方, 棋子类型), ...))
+    ('move', 时间, 行棋方, 棋子类型, 起点, 终点, 被吃棋子类型或None)
+    ('undo', 时间, 行棋方, 起点, 终点, 被吃棋子类型或None)
+    ('result', 时间, 胜方)
+剩余棋子由写入线程根据着法与悔棋自行维护棋子位置，不需要在界面线程扫描棋盘；
+输出时按位置逐行扫描的顺序列出，与原来扫描棋盘得到的顺序相同。
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from engine import PIECE_NAMES, opponent
+
+# 最早一条待写记录已等待这么多秒，或积攒了这么多条记录时写入并刷新文件
+FLUSH_INTERVAL = 1.0
+FLUSH_RECORDS = 64
+
+PLAYER_NAMES = {'red': '红方', 'blue': '蓝方'}
+
+
+class TextFormatter:
+    """与原来的 game_log.txt 相同的中文可读格式"""
+
+    def __init__(self):
+        # {位置: (行棋方, 棋子类型)}
+        self.squares = {}
+
+    def _time(self, timestamp):
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _remaining(self, player):
+        # 位置元组按 (行, 列) 排序即棋盘的扫描顺序
+        return ','.join(PIECE_NAMES[piece_type] for pos, (owner, piece_type) in sorted(self.squares.items())
+                        if owner == player)
+
+    def format(self, record):
+        kind = record[0]
+        if kind == 'start':
+            timestamp, squares = record[1], record[4]
+            self.squares = {pos: (player, piece_type) for pos, player, piece_type in squares}
+            return ('斗兽棋对战记录\n'
+                    f'对局开始时间：{self._time(timestamp)}\n'
+                    + '=' * 30 + '\n')
+        if kind == 'move':
+            _, timestamp, player, piece_type, old_pos, new_pos, captured = record
+            (old_row, old_col), (new_row, new_col) = old_pos, new_pos
+            self.squares[new_pos] = self.squares.pop(old_pos, (player, piece_type))
+            text = (f'[{self._time(timestamp)}] {PLAYER_NAMES[player]}{PIECE_NAMES[piece_type]}'
+                    f'从({old_row},{old_col})移动到({new_row},{new_col})')
+            if captured is not None:
+                text += f'，吃掉了对方的{PIECE_NAMES[captured]}'
+            return (text + '\n'
+                    f'红方剩余棋子：{self._remaining("red")}\n'
+                    f'蓝方剩余棋子：{self._remaining("blue")}\n'
+                    + '-' * 30 + '\n')
+        if kind == 'undo':
+            _, timestamp, player, old_pos, new_pos, captured = record
+            (old_row, old_col), (new_row, new_col) = old_pos, new_pos
+            self.squares[old_pos] = self.squares.pop(new_pos)
+            if captured is not None:
+                self.squares[new_pos] = (opponent(player), captured)
+            return (f'悔棋：撤销({old_row},{old_col})到({new_row},{new_col})的着法\n'
+                    + '-' * 30 + '\n')
+        if kind == 'result':
+            return '\n' + ('红方胜利' if record[2] == 'red' else '蓝方胜利') + '\n'
+        return ''
+
+
+class JsonFormatter:
+    """每条记录一行JSON，便于程序处理"""
+
+    def format(self, record):
+        kind = record[0]
+        data = {'type': kind, 'time': round(record[1], 3)}
+        if kind == 'start':
+            data.update({'red': [t.name for t in record[2]], 'blue': [t.name for t in record[3]]})
+        elif kind == 'move':
+            _, _, player, piece_type, from_pos, to_pos, captured = record
+            data.update({'player': player, 'piece': piece_type.name, 'from': from_pos, 'to': to_pos,
+                         'captured': captured.name if captured is not None else None})
+        elif kind == 'undo':
+            _, _, player, from_pos, to_pos, captured = record
+            data.update({'player': player, 'from': from_pos, 'to': to_pos,
+                         'captured': captured.name if captured is not None else None})
+        else:
+            data['winner'] = record[2]
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+FORMATTERS = {
+    'text': TextFormatter,
+    'jsonl': JsonFormatter,
+}
+
+
+class GameLogger:
+    """后台线程写日志；log_* 方法只往队列里放一个元组，不会阻塞调用方"""
+
+    def __init__(self, path='game_log.txt', formatter='text',
+                 flush_interval=FLUSH_INTERVAL, flush_records=FLUSH_RECORDS):
+        if formatter not in FORMATTERS:
+            raise ValueError(f'未知的日志格式：{formatter}')
+        self.path = path
+        self.formatter = FORMATTERS[formatter]()
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.records = queue.SimpleQueue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._writer, name='game-logger', daemon=True)
+        self.thread.start()
+
+    def start_game(self, state):
+        self.records.put(('start', time.time(),
+                          tuple(piece.type for piece in state.pieces('red')),
+                          tuple(piece.type for piece in state.pieces('blue')),
+                          tuple((piece.pos, piece.player, piece.type) for piece in state.pieces())))
+
+    def log_move(self, piece, old_pos, new_pos, captured_piece=None):
+        self.records.put(('move', time.time(), piece.player, piece.type, old_pos, new_pos,
+                          captured_piece.type if captured_piece else None))
+
+    def log_undo(self, player, old_pos, new_pos, captured_piece=None):
+        self.records.put(('undo', time.time(), player, old_pos, new_pos,
+                          captured_piece.type if captured_piece else None))
+
+    def log_result(self, winner):
+        self.records.put(('result', time.time(), winner))
+
+    def close(self, timeout=2.0):
+        """写完队列中剩余的记录并关闭文件"""
+        if self.closed:
+            return
+        self.closed = True
+        self.records.put(None)
+        self.thread.join(timeout)
+
+    def _writer(self):
+        # 没有待写记录时一直阻塞；第一条待写记录到达后最多等 flush_interval 秒
+        with open(self.path, 'w', encoding='utf-8') as f:
+            pending = []
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    record = self.records.get(timeout=timeout)
+                except queue.Empty:
+                    record = False
+                if record is None:
+                    break
+                if record:
+                    if not pending:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.append(self.formatter.format(record))
+                if pending and (len(pending) >= self.flush_records or time.monotonic() >= deadline):
+                    f.write(''.join(pending))
+                    f.flush()
+                    pending = []
+                    deadline = None
+            f.write(''.join(pending))
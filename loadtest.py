@@ -0,0 +1,152 @@
+"""联网对战服务器的压力测试：本地启动大量随机走子的机器人客户端，统计每秒着法数与延迟
+
+延迟指从发出着法到收到服务器推送的新局面之间的时间。默认在子进程中启动一个服务器，
+也可以用 --connect 测试已经在运行的服务器。
+
+用法示例：
+    python loadtest.py --clients 1000 --duration 20
+    python loadtest.py --clients 200 --unix
+    python loadtest.py --connect 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from engine import GameState
+from server import DEFAULT_MAX_PLIES, encode, parse_address, run_server
+
+LOADTEST_PORT = 8766
+
+
+class BotStats:
+    def __init__(self):
+        self.moves = 0
+        self.games = 0
+        self.errors = 0
+        self.latencies = []
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def open_connection(address, retries=50):
+    kind, *args = parse_address(address)
+    for attempt in range(retries):
+        try:
+            if kind == 'unix':
+                return await asyncio.open_unix_connection(args[0])
+            return await asyncio.open_connection(*args)
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def bot(address, stats, seed):
+    """随机走子的机器人：一局结束后继续排队，直到被取消"""
+    rng = random.Random(seed)
+    reader, writer = await open_connection(address)
+    writer.write(encode({'type': 'join'}))
+    color = None
+    sent_at = None
+    expected_ply = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            kind = message['type']
+            if kind == 'start':
+                color = message['color']
+            elif kind == 'state':
+                if sent_at is not None and message['ply'] == expected_ply:
+                    stats.latencies.append(time.perf_counter() - sent_at)
+                    stats.moves += 1
+                    sent_at = None
+                # 结束对局的那一步之后不再走子，等待 end 消息
+                if message['turn'] == color and not message['finished']:
+                    state = GameState.from_text(message['position'])
+                    moves = state.legal_moves()
+                    if moves:
+                        (from_pos, to_pos) = rng.choice(moves)
+                        expected_ply = message['ply'] + 1
+                        sent_at = time.perf_counter()
+                        writer.write(encode({'type': 'move', 'from': from_pos, 'to': to_pos}))
+            elif kind == 'end':
+                stats.games += 1
+                color = None
+                sent_at = None
+                writer.write(encode({'type': 'join'}))
+            elif kind == 'error':
+                stats.errors += 1
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def run_bots(address, clients, duration, seed=0):
+    stats = BotStats()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(bot(address, stats, seed * 100003 + i)) for i in range(clients)]
+    # 只统计测试时长内的着法；到时间后直接结束所有机器人
+    done, pending = await asyncio.wait(tasks, timeout=duration)
+    stats.elapsed = time.perf_counter() - start
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        if task.exception():
+            stats.errors += 1
+    return stats
+
+
+def _serve(address, max_plies):
+    try:
+        asyncio.run(run_server(address, max_plies))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋服务器压力测试')
+    parser.add_argument('--clients', type=int, default=200, help='机器人客户端数（每两个一局）')
+    parser.add_argument('--duration', type=float, default=10, help='测试时长（秒）')
+    parser.add_argument('--connect', help='测试已运行的服务器，如 127.0.0.1:8765 或 unix:/tmp/dsq.sock')
+    parser.add_argument('--unix', action='store_true', help='自动启动的服务器使用Unix套接字')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES, help='自动启动的服务器的步数上限')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    server = None
+    address = args.connect
+    if not address:
+        if args.unix:
+            address = 'unix:' + os.path.join(tempfile.gettempdir(), f'dsq-loadtest-{os.getpid()}.sock')
+        else:
+            address = f'127.0.0.1:{LOADTEST_PORT}'
+        server = multiprocessing.Process(target=_serve, args=(address, args.max_plies), daemon=True)
+        server.start()
+    try:
+        stats = asyncio.run(run_bots(address, args.clients, args.duration, args.seed))
+    finally:
+        if server:
+            server.terminate()
+            server.join()
+
+    print(f'客户端：{args.clients}  用时：{stats.elapsed:.1f}秒  完成对局：{stats.games // 2}  错误：{stats.errors}')
+    print(f'着法数：{stats.moves}  每秒着法：{stats.moves / stats.elapsed:.0f}')
+    print(f'延迟 p50：{stats.percentile(0.5) * 1000:.2f}毫秒  p99：{stats.percentile(0.99) * 1000:.2f}毫秒  '
+          f'最大：{stats.percentile(1.0) * 1000:.2f}毫秒')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,162 +1,98 @@
+import time
+# 启动计时的起点（在导入 pygame 之前）
+STARTUP_START = time.perf_counter()
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
 import pygame
 import sys
-from enum import Enum
-from utils import load_image
-import os
+import argparse
+import queue
+import threading
+import math
+from collections import OrderedDict
+from engine import PieceType, PIECE_NAMES, Piece, GameState
+from scheduler import FrameScheduler
+from game_logger import GameLogger
+from record import RecordWriter
+from utils import load_image, load_atlas, smooth_scale, resolve_font_path, StartupTimer, ATLAS_TILE
+from profiler import Profiler, run_cprofile
+
+# 后台搜索完成时投递的事件，用来唤醒阻塞等待中的主循环
+AI_DONE_EVENT = pygame.event.custom_type()
+# 联网模式下收到服务器消息时投递的事件
+NET_EVENT = pygame.event.custom_type()
+# 后台线程按新的格子大小缩放完图片时投递的事件
+SCALE_DONE_EVENT = pygame.event.custom_type()
+
+# 棋子图片与棋盘图片（images/ 下的文件名）
+PIECE_IMAGE_NAMES = {
+    PieceType.ELEPHANT: 'elephant',
+    PieceType.LION: 'lion',
+    PieceType.TIGER: 'tiger',
+    PieceType.LEOPARD: 'leopard',
+    PieceType.WOLF: 'wolf',
+    PieceType.DOG: 'dog',
+    PieceType.CAT: 'cat',
+    PieceType.RAT: 'rat',
+}
+BOARD_IMAGE_NAMES = ('trap', 'den', 'water', 'tile')
+# 窗口四周留给棋盘之外的边距（像素），以及格子的最小边长
+WINDOW_MARGIN = 100
+MIN_CELL_SIZE = 24
+# 最多缓存几种格子大小的缩放结果
+SIZE_CACHE_LIMIT = 4
+# 性能剖析的计时阶段（DouShouQi 的方法）与叠加层上显示的名称
+PROFILE_PHASES = (
+    ('handle_events', 'events', '事件'),
+    ('legal_move_map', 'movegen', '着法生成'),
+    ('draw_board', 'board', '棋盘'),
+    ('draw_pieces', 'pieces', '棋子'),
+    ('present', 'flip', '提交画面'),
+    ('log_move', 'logging', '日志'),
+)
+# 计数的规则调用
+PROFILE_COUNTERS = (
+    (Piece, 'can_move'),
+    (Piece, 'can_capture'),
+    (GameState, 'legal_moves'),
+    (GameState, 'make_move'),
+)
 
-# 初始化Pygame
-pygame.init()
-
-# 定义棋子类型
-class PieceType(Enum):
-    ELEPHANT = 8
-    LION = 7
-    TIGER = 6
-    LEOPARD = 5
-    WOLF = 4
-    DOG = 3
-    CAT = 2
-    RAT = 1
-
-# 定义棋子类
-class Piece:
-    def __init__(self, piece_type, player, pos):
-        self.type = piece_type
-        self.player = player  # 'red' or 'blue'
-        self.pos = pos  # (row, col)
-        self.selected = False
-        
-    def can_move(self, target_pos, board):
-        row, col = self.pos
-        target_row, target_col = target_pos
-        
-        # 狮虎跳河规则
-        if self.type in [PieceType.LION, PieceType.TIGER]:
-            # 检查是否是横向或纵向跳跃
-            if (row == target_row and abs(col - target_col) == 3) or \
-               (col == target_col and abs(row - target_row) == 4):
-                # 检查是否在河流两侧
-                if row == target_row:  # 横向跳跃
-                    # 确保起点和终点都不在河中
-                    if not self._is_river(row, col) and not self._is_river(target_row, target_col):
-                        # 确保中间是河流
-                        middle_col1 = min(col, target_col) + 1
-                        middle_col2 = min(col, target_col) + 2
-                        if self._is_river(row, middle_col1) and self._is_river(row, middle_col2):
-                            # 检查是否有老鼠阻挡
-                            if self._is_valid_jump(row, col, target_row, target_col, board):
-                                return True
-                else:  # 纵向跳跃
-                    # 确保起点和终点都不在河中
-                    if not self._is_river(row, col) and not self._is_river(target_row, target_col):
-                        # 确保中间是河流
-                        middle_row1 = min(row, target_row) + 1
-                        middle_row2 = min(row, target_row) + 2
-                        middle_row3 = min(row, target_row) + 3
-                        if self._is_river(middle_row1, col) and self._is_river(middle_row2, col) and self._is_river(middle_row3, col):
-                            # 检查是否有老鼠阻挡
-                            if self._is_valid_jump(row, col, target_row, target_col, board):
-                                return True
-        
-        # 基本移动规则：只能上下左右移动一格
-        if abs(row - target_row) + abs(col - target_col) != 1:
-            return False
-            
-        # 检查目标位置是否有己方棋子
-        if board[target_row][target_col] is not None:
-            if board[target_row][target_col].player == self.player:
-                return False
-                
-        # 特殊规则：河流判定
-        if self._is_river(target_row, target_col):
-            if self.type != PieceType.RAT:
-                return False
-                
-        # 特殊规则：兽穴判定
-        if self._is_den(target_row, target_col, self.player):
-            return False
-            
-        return True
-
-    def _is_valid_jump(self, row, col, target_row, target_col, board):
-        # 检查是否是有效的跳跃（没有老鼠阻挡）
-        if row == target_row:  # 横向跳跃
-            start_col = min(col, target_col) + 1
-            end_col = max(col, target_col)
-            for c in range(start_col, end_col):
-                if board[row][c] is not None and board[row][c].type == PieceType.RAT:
-                    return False
-        else:  # 纵向跳跃
-            start_row = min(row, target_row) + 1
-            end_row = max(row, target_row)
-            for r in range(start_row, end_row):
-                if board[r][col] is not None and board[r][col].type == PieceType.RAT:
-                    return False
-        return True
-        
-    def can_capture(self, target_piece, board):
-        # 检查是否在对方陷阱中
-        target_row, target_col = target_piece.pos
-        if target_piece._is_trap(target_row, target_col, self.player):
-            return True  # 在对方陷阱中的棋子可以被任意棋子吃掉，因为其战斗力变为0
-        
-        # 检查自己是否在对方陷阱中
-        row, col = self.pos
-        if self._is_trap(row, col, target_piece.player):
-            return False  # 在对方陷阱中的棋子战斗力为0，无法吃掉其他棋子
-        
-        # 老鼠可以吃大象
-        if self.type == PieceType.RAT and target_piece.type == PieceType.ELEPHANT:
-            return True
-        # 大象不能吃老鼠
-        if self.type == PieceType.ELEPHANT and target_piece.type == PieceType.RAT:
-            return False
-        # 其他情况下，大的可以吃小的
-        return self.type.value >= target_piece.type.value
-        
-    def _is_river(self, row, col):
-        return (3 <= row <= 5) and (col in [1, 2, 4, 5])
-        
-    def _is_den(self, row, col, player):
-        if player == 'red':
-            return row == 8 and col == 3
-        else:
-            return row == 0 and col == 3
-        
-    def _is_trap(self, row, col, player):
-        if player == 'red':
-            return (row == 8 and col == 2) or \
-                   (row == 8 and col == 4) or \
-                   (row == 7 and col == 3)
-        else:
-            return (row == 0 and col == 2) or \
-                   (row == 0 and col == 4) or \
-                   (row == 1 and col == 3)
 
 class DouShouQi:
-    def __init__(self):
+    def __init__(self, log_format='text', startup=None, fullscreen=False):
+        # startup 为 StartupTimer，记录各阶段启动耗时；窗口可以拉伸，fullscreen 为真时全屏启动
+        self.startup = startup or StartupTimer()
+
+        # 只初始化用到的 pygame 模块（不需要声音、手柄等）
+        pygame.display.init()
+        pygame.font.init()
+        self.startup.mark('pygame')
+
         # 设置窗口大小
         self.WINDOW_SIZE = (800, 900)
         self.BOARD_SIZE = (700, 800)  # 棋盘大小
-        self.screen = pygame.display.set_mode(self.WINDOW_SIZE)
+        self.windowed_size = self.WINDOW_SIZE
+        self.fullscreen = fullscreen
+        if fullscreen:
+            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            self.WINDOW_SIZE = self.screen.get_size()
+        else:
+            self.screen = pygame.display.set_mode(self.WINDOW_SIZE, pygame.RESIZABLE)
         pygame.display.set_caption('斗兽棋')
+        self.startup.mark('窗口')
         
-        # 初始化字体，使用系统默认中文字体
+        # 初始化字体：中文字体路径只在第一次运行时查找，之后从缓存读取
+        font_path = self.font_path = resolve_font_path()
         try:
-            self.font = pygame.font.Font('/System/Library/Fonts/PingFang.ttc', 30)
-            self.turn_font = pygame.font.Font('/System/Library/Fonts/PingFang.ttc', 40)
-            self.winner_font = pygame.font.Font('/System/Library/Fonts/PingFang.ttc', 60)
-        except:
-            # 如果找不到 PingFang 字体，尝试使用其他中文字体
-            try:
-                self.font = pygame.font.Font('/System/Library/Fonts/STHeiti Light.ttc', 30)
-                self.turn_font = pygame.font.Font('/System/Library/Fonts/STHeiti Light.ttc', 40)
-                self.winner_font = pygame.font.Font('/System/Library/Fonts/STHeiti Light.ttc', 60)
-            except:
-                # 如果还是找不到，使用系统默认字体
-                self.font = pygame.font.SysFont('SimHei', 30)
-                self.turn_font = pygame.font.SysFont('SimHei', 40)
-                self.winner_font = pygame.font.SysFont('SimHei', 60)
+            self.font = pygame.font.Font(font_path, 30)
+            self.turn_font = pygame.font.Font(font_path, 40)
+            self.winner_font = pygame.font.Font(font_path, 60)
+        except (OSError, pygame.error):
+            self.font = pygame.font.Font(None, 30)
+            self.turn_font = pygame.font.Font(None, 40)
+            self.winner_font = pygame.font.Font(None, 60)
+        self.startup.mark('字体')
         
         # 颜色定义
         self.BACKGROUND_COLOR = (227, 205, 168)  # 竹简色 #E3CDA8
@@ -167,24 +103,68 @@ class DouShouQi:
         self.TRAP_COLOR = (139, 0, 0)      # 暗红色 #8B0000
         self.DEN_COLOR = (215, 184, 153)   # 浅木色 #D7B899
         self.TEXT_COLOR = (255, 255, 255)  # 白色 #FFFFFF
+        self.OVERLAY_POS = (8, 8)  # 性能叠加层的位置
         
-        # 棋盘格子大小
-        self.CELL_SIZE = min(self.BOARD_SIZE[0] // 7, self.BOARD_SIZE[1] // 9)
+        # 棋盘格子大小（随窗口大小变化）
+        self.CELL_SIZE = self.fit_cell_size(self.WINDOW_SIZE)
         self.LINE_WIDTH = max(2, self.CELL_SIZE // 20)  # 根据格子大小调整线条粗细
         
-        # 初始化棋子图片字典
+        # 解码后的原图，以及当前格子大小的缩放图片（棋子图片键为 (类型, 玩家)）
+        self.source_images = {}
         self.piece_images = {}
+        # 取自图集的原图（只有 ATLAS_TILE 像素），放大时改为解码原始PNG，见 source_image()
+        self.atlas_names = set()
+        # 绘制缓存：静态棋盘背景与最终尺寸的棋子图像
+        self.board_surface = None
+        self.board_surface_key = None
+        self.sprite_cache = {}
+        # 按格子大小的LRU缓存：{格子大小: {'images': 缩放图片, 'sprites': 棋子图像}}
+        self.size_cache = OrderedDict()
+        # 窗口大小变化后要切换到的格子大小；缩放在后台线程进行
+        self.target_cell_size = self.CELL_SIZE
+        self.scale_thread = None
+        self.scale_results = queue.Queue()
+        # 脏矩形绘制：上一帧的画面摘要；需要整窗重画时置 full_redraw
+        self.last_render_state = None
+        self.full_redraw = True
         
-        # 加载棋子图片
+        # 加载棋子图片，并为初始格子大小缩放
         self.load_piece_images()
+        self.store_scaled_images(self.CELL_SIZE, self.scale_images(self.CELL_SIZE))
+        self.apply_cell_size(self.CELL_SIZE)
+        self.startup.mark('图片')
         
-        # 初始化棋盘状态
-        self.board = [[None for _ in range(7)] for _ in range(9)]
+        # 初始化棋盘状态（规则与棋盘数据由引擎负责）
+        self.state = GameState()
         self.selected_piece = None
-        self.current_player = 'red'  # 红方先手
         self.dragging = False
         self.drag_pos = None
-        self.winner = None
+        # 当前局面合法着法的缓存，见 legal_move_map()
+        self.legal_moves_cache = {}
+        self.legal_moves_key = None
+        # 重做栈：悔棋撤销掉的着法
+        self.redo_stack = []
+        # 电脑对手（人机模式由 run() 设置），搜索在后台线程进行
+        self.ai_player = None
+        self.ai_time_ms = 1000
+        self.ai_searcher = None
+        self.ai_thread = None
+        self.ai_results = queue.Queue()
+        # 联网对战（run() 传入 connect 时连接服务器），net_color 为服务器分配的一方
+        self.net = None
+        self.net_color = None
+        # 按服务器局面重新同步后，棋谱从这个局面（局面文本）开始记录；None 为标准开局
+        self.record_start = None
+        # 性能剖析：只在打开叠加层（F3）或 run() 传入 profile 时才替换被观察的方法
+        self.profiler = Profiler()
+        for method, phase, _ in PROFILE_PHASES:
+            self.profiler.time_method(self, method, phase)
+        for owner, method in PROFILE_COUNTERS:
+            self.profiler.count_method(owner, method)
+        self.profile_path = None
+        self.show_overlay = False
+        self.overlay_font = None
+        self.overlay_rect = None
         
         # 存储被吃掉的棋子
         self.captured_pieces = {'red': [], 'blue': []}
@@ -195,147 +175,178 @@ class DouShouQi:
         self.ANIMATION_FRAMES = 30  # 每次摆动的帧数
         self.ANIMATION_REPEATS = 5  # 摆动次数
         
-        # 初始化日志文件
+        # 初始化日志文件（log_format 为 'text' 中文可读格式或 'jsonl'）
+        self.log_format = log_format
         self.init_log_file()
-        
-        # 初始化棋子位置
-        self.init_pieces()
+        self.startup.mark('棋盘与日志')
+
+
+    @property
+    def board(self):
+        return self.state.board
+
+    @property
+    def current_player(self):
+        return self.state.current_player
+
+    @property
+    def winner(self):
+        return self.state.winner
 
 
     def init_log_file(self):
-        self.log_file = open('game_log.txt', 'w', encoding='utf-8')
-        from datetime import datetime
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.log_file.write('斗兽棋对战记录\n')
-        self.log_file.write('对局开始时间：' + current_time + '\n')
-        self.log_file.write('=' * 30 + '\n')
-        self.log_file.flush()
+        # 日志由后台线程写入，界面线程只提交记录
+        self.logger = GameLogger('game_log.txt', formatter=self.log_format)
+        self.logger.start_game(self.state)
 
 
     def log_move(self, piece, old_pos, new_pos, captured_piece=None):
-        from datetime import datetime
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        player_name = '红方' if piece.player == 'red' else '蓝方'
-        piece_name = {
-            PieceType.ELEPHANT: '象',
-            PieceType.LION: '狮',
-            PieceType.TIGER: '虎',
-            PieceType.LEOPARD: '豹',
-            PieceType.WOLF: '狼',
-            PieceType.DOG: '狗',
-            PieceType.CAT: '猫',
-            PieceType.RAT: '鼠'
-        }[piece.type]
-
-        old_row, old_col = old_pos
-        new_row, new_col = new_pos
-        move_str = f'[{current_time}] {player_name}{piece_name}从({old_row},{old_col})移动到({new_row},{new_col})'
-
-        if captured_piece:
-            captured_name = {
-                PieceType.ELEPHANT: '象',
-                PieceType.LION: '狮',
-                PieceType.TIGER: '虎',
-                PieceType.LEOPARD: '豹',
-                PieceType.WOLF: '狼',
-                PieceType.DOG: '狗',
-                PieceType.CAT: '猫',
-                PieceType.RAT: '鼠'
-            }[captured_piece.type]
-            move_str += f'，吃掉了对方的{captured_name}'
-
-        self.log_file.write(move_str + '\n')
-        self.log_remaining_pieces()
-        self.log_file.flush()
-
-
-    def log_remaining_pieces(self):
-        red_pieces = []
-        blue_pieces = []
-        for row in range(9):
-            for col in range(7):
-                piece = self.board[row][col]
-                if piece:
-                    piece_name = {
-                        PieceType.ELEPHANT: '象',
-                        PieceType.LION: '狮',
-                        PieceType.TIGER: '虎',
-                        PieceType.LEOPARD: '豹',
-                        PieceType.WOLF: '狼',
-                        PieceType.DOG: '狗',
-                        PieceType.CAT: '猫',
-                        PieceType.RAT: '鼠'
-                    }[piece.type]
-                    if piece.player == 'red':
-                        red_pieces.append(piece_name)
-                    else:
-                        blue_pieces.append(piece_name)
-
-        self.log_file.write(f'红方剩余棋子：{",".join(red_pieces)}\n')
-        self.log_file.write(f'蓝方剩余棋子：{",".join(blue_pieces)}\n')
-        self.log_file.write('-' * 30 + '\n')
+        self.logger.log_move(piece, old_pos, new_pos, captured_piece)
 
 
     def check_win(self):
-        # 检查是否有一方进入对方兽穴
-        for row in range(9):
-            for col in range(7):
-                piece = self.board[row][col]
-                if piece:
-                    # 检查是否进入对方兽穴
-                    if (piece.player == 'red' and row == 0 and col == 3) or \
-                       (piece.player == 'blue' and row == 8 and col == 3):
-                        return piece.player
+        return self.state.check_win()
 
-        # 检查是否有一方的棋子全部被吃掉
-        red_pieces = blue_pieces = 0
-        for row in range(9):
-            for col in range(7):
-                piece = self.board[row][col]
-                if piece:
-                    if piece.player == 'red':
-                        red_pieces += 1
-                    else:
-                        blue_pieces += 1
 
-        if red_pieces == 0:
-            return 'blue'
-        if blue_pieces == 0:
-            return 'red'
-
-        return None
+    def legal_move_map(self):
+        # 当前局面行棋方的全部合法着法，按起点分组；每个局面只生成一次，
+        # 以局面哈希和步数为键，走子、悔棋、重做后自动失效
+        key = (self.state.hash, len(self.state.history))
+        if self.legal_moves_key != key:
+            moves = {}
+            for from_pos, to_pos in self.state.legal_moves():
+                moves.setdefault(from_pos, []).append(to_pos)
+            self.legal_moves_cache = moves
+            self.legal_moves_key = key
+        return self.legal_moves_cache
 
 
     def get_valid_moves(self, piece):
-        valid_moves = []
-        for row in range(9):
-            for col in range(7):
-                if piece.can_move((row, col), self.board):
-                    target_piece = self.board[row][col]
-                    if target_piece is None or piece.can_capture(target_piece, self.board):
-                        valid_moves.append((row, col))
-        return valid_moves
+        if piece.player != self.current_player:
+            return self.state.get_valid_moves(piece)
+        return self.legal_move_map().get(piece.pos, [])
 
 
-    def draw_board(self):
-        # 绘制棋盘背景
-        self.screen.fill(self.BACKGROUND_COLOR)
-        
-        # 计算棋盘的起始位置（居中）
-        start_x = (self.WINDOW_SIZE[0] - 7 * self.CELL_SIZE) // 2
-        start_y = (self.WINDOW_SIZE[1] - 9 * self.CELL_SIZE) // 2
-        
-        # 绘制棋盘边框
-        border_color = self.RED_COLOR if self.current_player == 'red' else self.BLUE_COLOR
-        pygame.draw.rect(self.screen, border_color,
-                       (start_x - self.LINE_WIDTH, start_y - self.LINE_WIDTH,
-                        7 * self.CELL_SIZE + 2 * self.LINE_WIDTH,
-                        9 * self.CELL_SIZE + 2 * self.LINE_WIDTH),
-                       self.LINE_WIDTH)
-        
+    def is_legal_move(self, move):
+        from_pos, to_pos = move
+        return to_pos in self.legal_move_map().get(from_pos, ())
+
+
+    def board_origin(self):
         # 计算棋盘的起始位置（居中）
         start_x = (self.WINDOW_SIZE[0] - 7 * self.CELL_SIZE) // 2
         start_y = (self.WINDOW_SIZE[1] - 9 * self.CELL_SIZE) // 2
+        return start_x, start_y
+
+
+    def invalidate_render_cache(self):
+        # 窗口或格子大小变化后调用，下次绘制时重建背景（棋子图像按格子大小缓存在 size_cache 中）
+        self.board_surface = None
+        self.board_surface_key = None
+
+
+    def fit_cell_size(self, window_size):
+        # 窗口四周各留出边距后，能放下 7x9 个格子的最大边长
+        self.BOARD_SIZE = (window_size[0] - WINDOW_MARGIN, window_size[1] - WINDOW_MARGIN)
+        return max(MIN_CELL_SIZE, min(self.BOARD_SIZE[0] // 7, self.BOARD_SIZE[1] // 9))
+
+
+    def resize_window(self):
+        # 窗口大小或全屏状态变化后调用：立即按新窗口重画，格子大小在缩放完成后再切换
+        self.screen = pygame.display.get_surface()
+        self.WINDOW_SIZE = self.screen.get_size()
+        self.full_redraw = True
+        self.request_cell_size(self.fit_cell_size(self.WINDOW_SIZE))
+
+
+    def toggle_fullscreen(self):
+        if self.fullscreen:
+            pygame.display.set_mode(self.windowed_size, pygame.RESIZABLE)
+        else:
+            self.windowed_size = self.WINDOW_SIZE
+            pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        self.fullscreen = not self.fullscreen
+        self.resize_window()
+
+
+    def scale_images(self, cell_size):
+        # 从原图平滑缩放出该格子大小需要的全部图片；只读 source_images，可以在后台线程中运行
+        piece_size = int(int(cell_size // 2.5) * 1.618)  # 棋子图片填充棋子圆形区域
+        images = {}
+        for piece_type, name in PIECE_IMAGE_NAMES.items():
+            source = self.source_image(name, piece_size)
+            image = smooth_scale(source, (piece_size, piece_size)) if source else None
+            # 为红蓝双方都使用相同的图片
+            images[(piece_type, 'red')] = image
+            images[(piece_type, 'blue')] = image
+        for name in BOARD_IMAGE_NAMES:
+            source = self.source_image(name, cell_size)
+            images[name] = smooth_scale(source, (cell_size, cell_size)) if source else None
+        return images
+
+
+    def source_image(self, name, size):
+        # 要缩放到 size 像素的原图：图集里的图片比 size 小时改用原始PNG（只解码一次），
+        # 避免格子很大（如4K全屏）时把图集放大得发糊
+        if name in self.atlas_names and size > ATLAS_TILE:
+            self.atlas_names.discard(name)
+            try:
+                self.source_images[name] = load_image(os.path.join('images', f'{name}.png'))
+            except FileNotFoundError:
+                pass  # 没有原图时继续使用图集中的图片
+        return self.source_images.get(name)
+
+
+    def store_scaled_images(self, cell_size, images):
+        self.size_cache[cell_size] = {'images': images, 'sprites': {}}
+        self.size_cache.move_to_end(cell_size)
+        while len(self.size_cache) > SIZE_CACHE_LIMIT:
+            self.size_cache.popitem(last=False)
+
+
+    def apply_cell_size(self, cell_size):
+        # 切换到缓存中已有的格子大小
+        entry = self.size_cache[cell_size]
+        self.size_cache.move_to_end(cell_size)
+        self.CELL_SIZE = cell_size
+        self.LINE_WIDTH = max(2, cell_size // 20)
+        self.piece_images = entry['images']
+        self.sprite_cache = entry['sprites']
+        self.full_redraw = True
+
+
+    def request_cell_size(self, cell_size):
+        # 缓存中有该大小时立即切换，否则交给后台线程缩放；缩放完成前仍按原来的格子大小
+        # 居中绘制，鼠标位置的换算始终与画面一致
+        self.target_cell_size = cell_size
+        if cell_size in self.size_cache:
+            if cell_size != self.CELL_SIZE:
+                self.apply_cell_size(cell_size)
+        elif self.scale_thread is None:
+            self.scale_thread = threading.Thread(target=self.scale_in_background, args=(cell_size,), daemon=True)
+            self.scale_thread.start()
+
+
+    def scale_in_background(self, cell_size):
+        self.scale_results.put((cell_size, self.scale_images(cell_size)))
+        pygame.event.post(pygame.event.Event(SCALE_DONE_EVENT))
+
+
+    def update_scaling(self):
+        # 取回后台缩放的结果；拖动窗口边缘期间目标大小可能已经又变了，继续缩放最新的大小
+        while not self.scale_results.empty():
+            cell_size, images = self.scale_results.get_nowait()
+            self.scale_thread = None
+            self.store_scaled_images(cell_size, images)
+        if self.target_cell_size != self.CELL_SIZE:
+            self.request_cell_size(self.target_cell_size)
+
+
+    def build_board_surface(self):
+        # 把不会变化的部分（背景、草地、河流、陷阱、兽穴、格线）画到一张缓存的背景图上
+        surface = pygame.Surface(self.WINDOW_SIZE).convert()
+        surface.fill(self.BACKGROUND_COLOR)
+        start_x, start_y = self.board_origin()
 
         # 绘制所有格子的草地背景
         if self.piece_images.get('tile'):
@@ -344,7 +355,7 @@ class DouShouQi:
                     tile_rect = pygame.Rect(start_x + col * self.CELL_SIZE,
                                            start_y + row * self.CELL_SIZE,
                                            self.CELL_SIZE, self.CELL_SIZE)
-                    self.screen.blit(self.piece_images['tile'], tile_rect)
+                    surface.blit(self.piece_images['tile'], tile_rect)
         
         # 绘制特殊区域
         # 河流
@@ -355,10 +366,10 @@ class DouShouQi:
                     water_rect = pygame.Rect(start_x + col * self.CELL_SIZE,
                                           start_y + row * self.CELL_SIZE,
                                           self.CELL_SIZE, self.CELL_SIZE)
-                    self.screen.blit(self.piece_images['water'], water_rect)
+                    surface.blit(self.piece_images['water'], water_rect)
                 else:
                     # 如果没有图片，使用原有的绘制方式
-                    pygame.draw.rect(self.screen, self.RIVER_COLOR,
+                    pygame.draw.rect(surface, self.RIVER_COLOR,
                                    (start_x + col * self.CELL_SIZE,
                                     start_y + row * self.CELL_SIZE,
                                     self.CELL_SIZE, self.CELL_SIZE))
@@ -371,20 +382,20 @@ class DouShouQi:
                 trap_rect = pygame.Rect(start_x + col * self.CELL_SIZE,
                                       start_y + row * self.CELL_SIZE,
                                       self.CELL_SIZE, self.CELL_SIZE)
-                self.screen.blit(self.piece_images['trap'], trap_rect)
+                surface.blit(self.piece_images['trap'], trap_rect)
             else:
                 # 如果没有图片，使用原有的绘制方式
-                pygame.draw.rect(self.screen, self.TRAP_COLOR,
+                pygame.draw.rect(surface, self.TRAP_COLOR,
                                (start_x + col * self.CELL_SIZE,
                                 start_y + row * self.CELL_SIZE,
                                 self.CELL_SIZE, self.CELL_SIZE))
                 center_x = start_x + col * self.CELL_SIZE + self.CELL_SIZE // 2
                 center_y = start_y + row * self.CELL_SIZE + self.CELL_SIZE // 2
                 line_length = self.CELL_SIZE // 3
-                pygame.draw.line(self.screen, self.GRID_COLOR,
+                pygame.draw.line(surface, self.GRID_COLOR,
                                (center_x - line_length, center_y),
                                (center_x + line_length, center_y), 2)
-                pygame.draw.line(self.screen, self.GRID_COLOR,
+                pygame.draw.line(surface, self.GRID_COLOR,
                                (center_x, center_y - line_length),
                                (center_x, center_y + line_length), 2)
         
@@ -396,104 +407,305 @@ class DouShouQi:
                 den_rect = pygame.Rect(start_x + col * self.CELL_SIZE,
                                      start_y + row * self.CELL_SIZE,
                                      self.CELL_SIZE, self.CELL_SIZE)
-                self.screen.blit(self.piece_images['den'], den_rect)
+                surface.blit(self.piece_images['den'], den_rect)
             else:
                 # 如果没有图片，使用原有的绘制方式
                 center_x = start_x + col * self.CELL_SIZE + self.CELL_SIZE // 2
                 center_y = start_y + row * self.CELL_SIZE + self.CELL_SIZE // 2
-                pygame.draw.circle(self.screen, self.DEN_COLOR,
+                pygame.draw.circle(surface, self.DEN_COLOR,
                                  (center_x, center_y),
                                  self.CELL_SIZE // 2)
-                pygame.draw.circle(self.screen, self.GRID_COLOR,
+                pygame.draw.circle(surface, self.GRID_COLOR,
                                  (center_x, center_y),
                                  self.CELL_SIZE // 3, 2)
-                pygame.draw.circle(self.screen, self.GRID_COLOR,
+                pygame.draw.circle(surface, self.GRID_COLOR,
                                  (center_x, center_y),
                                  self.CELL_SIZE // 8)
         
         # 绘制横线
         for i in range(10):
-            pygame.draw.line(self.screen, self.GRID_COLOR,
+            pygame.draw.line(surface, self.GRID_COLOR,
                            (start_x, start_y + i * self.CELL_SIZE),
                            (start_x + 7 * self.CELL_SIZE, start_y + i * self.CELL_SIZE))
         
         # 绘制竖线
         for i in range(8):
-            pygame.draw.line(self.screen, self.GRID_COLOR,
+            pygame.draw.line(surface, self.GRID_COLOR,
                            (start_x + i * self.CELL_SIZE, start_y),
                            (start_x + i * self.CELL_SIZE, start_y + 9 * self.CELL_SIZE))
+        return surface
+
+
+    def get_piece_sprite(self, piece_type, player):
+        # 棋子最终尺寸的图像（底色圆 + 缩放后的图片或文字），按 (类型, 玩家, 格子大小) 缓存
+        key = (piece_type, player, self.CELL_SIZE)
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            sprite = self.build_piece_sprite(piece_type, player)
+            self.sprite_cache[key] = sprite
+        return sprite
+
+
+    def build_piece_sprite(self, piece_type, player):
+        color = self.RED_COLOR if player == 'red' else self.BLUE_COLOR
+        piece_radius = int(self.CELL_SIZE // 2.5)  # 增加棋子半径
+        size = piece_radius * 2 + 1
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+        center = (piece_radius, piece_radius)
+
+        # 绘制棋子底色
+        pygame.draw.circle(sprite, color, center, piece_radius)
+        
+        # 绘制棋子边框
+        pygame.draw.circle(sprite, color, center, piece_radius, max(2, self.CELL_SIZE // 20))
+
+        # 绘制棋子图片（已按当前格子大小缩放好，见 scale_images）
+        image = self.piece_images.get((piece_type, player))
+        if image:
+            sprite.blit(image, image.get_rect(center=center))
+        else:
+            # 如果没有找到图片，使用文字作为后备显示
+            text = self.font.render(PIECE_NAMES[piece_type], True, self.TEXT_COLOR)
+            sprite.blit(text, text.get_rect(center=center))
+        return sprite
+
+
+    def cell_rect(self, row, col):
+        start_x, start_y = self.board_origin()
+        return pygame.Rect(start_x + col * self.CELL_SIZE, start_y + row * self.CELL_SIZE,
+                           self.CELL_SIZE, self.CELL_SIZE)
+
+
+    def border_rects(self):
+        # 回合边框的上下左右四条（换边时只需重画这四块）
+        start_x, start_y = self.board_origin()
+        width = 7 * self.CELL_SIZE + 2 * self.LINE_WIDTH
+        height = 9 * self.CELL_SIZE + 2 * self.LINE_WIDTH
+        left = start_x - self.LINE_WIDTH
+        top = start_y - self.LINE_WIDTH
+        return [pygame.Rect(left, top, width, self.LINE_WIDTH),
+                pygame.Rect(left, top + height - self.LINE_WIDTH, width, self.LINE_WIDTH),
+                pygame.Rect(left, top, self.LINE_WIDTH, height),
+                pygame.Rect(left + width - self.LINE_WIDTH, top, self.LINE_WIDTH, height)]
+
+
+    def draw_board(self, rects=None):
+        # rects 为需要重画的区域；不传时重画整个窗口
+        # 背景只在窗口或格子大小变化时重建
+        key = (self.WINDOW_SIZE, self.CELL_SIZE)
+        if self.board_surface_key != key:
+            self.invalidate_render_cache()
+            self.board_surface = self.build_board_surface()
+            self.board_surface_key = key
+
+        if rects is None:
+            self.screen.blit(self.board_surface, (0, 0))
+            self.draw_layers(None)
+            return
+
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.screen.blit(self.board_surface, rect.topleft, rect)
+            self.draw_layers(rect)
+        self.screen.set_clip(None)
+
+
+    def draw_layers(self, clip):
+        # 在背景之上绘制边框、可走位置与棋子；clip 不为空时跳过与其不相交的格子
+        start_x, start_y = self.board_origin()
+        
+        # 绘制棋盘边框
+        border_color = self.RED_COLOR if self.current_player == 'red' else self.BLUE_COLOR
+        pygame.draw.rect(self.screen, border_color,
+                       (start_x - self.LINE_WIDTH, start_y - self.LINE_WIDTH,
+                        7 * self.CELL_SIZE + 2 * self.LINE_WIDTH,
+                        9 * self.CELL_SIZE + 2 * self.LINE_WIDTH),
+                       self.LINE_WIDTH)
+        # 边框会盖住最右、最下两条格线，从背景图补回
+        for strip in ((start_x + 7 * self.CELL_SIZE, start_y, 1, 9 * self.CELL_SIZE + 1),
+                      (start_x, start_y + 9 * self.CELL_SIZE, 7 * self.CELL_SIZE + 1, 1)):
+            self.screen.blit(self.board_surface, strip[:2], strip)
+
+        piece_radius = int(self.CELL_SIZE // 2.5)
 
         # 如果有选中的棋子，绘制可移动位置的虚线圆圈
         if self.selected_piece:
             valid_moves = self.get_valid_moves(self.selected_piece)
             for row, col in valid_moves:
+                if clip and not clip.colliderect(self.cell_rect(row, col)):
+                    continue
                 center_x = start_x + col * self.CELL_SIZE + self.CELL_SIZE // 2
                 center_y = start_y + row * self.CELL_SIZE + self.CELL_SIZE // 2
-                piece_radius = int(self.CELL_SIZE // 2.5)
                 # 绘制实心点
                 point_radius = piece_radius // 6  # 点的大小为棋子半径的1/6
                 pygame.draw.circle(self.screen, (255, 255, 0),
                                  (center_x, center_y),
                                  point_radius)
-        
-        # 绘制棋子
+
+        self.draw_pieces(clip)
+
+
+    def draw_pieces(self, clip):
+        # 绘制棋子与选中效果；clip 不为空时跳过与其不相交的格子
+        start_x, start_y = self.board_origin()
+        piece_radius = int(self.CELL_SIZE // 2.5)
+        for piece in self.state.pieces():
+            row, col = piece.pos
+            if clip and not clip.colliderect(self.cell_rect(row, col)):
+                continue
+            center_x = start_x + col * self.CELL_SIZE + self.CELL_SIZE // 2 + self.animation_offset(piece)
+            center_y = start_y + row * self.CELL_SIZE + self.CELL_SIZE // 2
+            sprite = self.get_piece_sprite(piece.type, piece.player)
+            self.screen.blit(sprite, (center_x - piece_radius, center_y - piece_radius))
+
+            # 绘制选中效果
+            if piece is self.selected_piece:
+                pygame.draw.circle(self.screen, (255, 255, 0),
+                                 (center_x, center_y),
+                                 piece_radius, 2)
+
+
+    def draw_winner(self):
+        # 如果有获胜方，显示获胜信息
+        winner_text = '红方胜利' if self.winner == 'red' else '蓝方胜利'
+        winner_surface = self.winner_font.render(winner_text, True,
+                                               self.RED_COLOR if self.winner == 'red' else self.BLUE_COLOR)
+        text_rect = winner_surface.get_rect(center=(self.WINDOW_SIZE[0] // 2, self.WINDOW_SIZE[1] // 2))
+        self.screen.blit(winner_surface, text_rect)
+
+
+    def render_state(self):
+        # 画面内容摘要：每个格子的棋子、选中与可走标记，以及边框颜色、胜负和尺寸
+        highlights = set(self.get_valid_moves(self.selected_piece)) if self.selected_piece else ()
+        cells = []
         for row in range(9):
             for col in range(7):
                 piece = self.board[row][col]
+                content = None
                 if piece:
-                    color = self.RED_COLOR if piece.player == 'red' else self.BLUE_COLOR
-                    center_x = start_x + col * self.CELL_SIZE + self.CELL_SIZE // 2
-                    center_y = start_y + row * self.CELL_SIZE + self.CELL_SIZE // 2
-                    piece_radius = int(self.CELL_SIZE // 2.5)  # 增加棋子半径
-                    
-                    # 绘制棋子底色
-                    pygame.draw.circle(self.screen, color,
-                                     (center_x, center_y),
-                                     piece_radius)
-                    
-                    # 绘制棋子边框
-                    pygame.draw.circle(self.screen, color,
-                                     (center_x, center_y),
-                                     piece_radius,
-                                     max(2, self.CELL_SIZE // 20))
-                    
-                    # 绘制选中效果
-                    if piece.selected or (self.dragging and piece == self.selected_piece):
-                        pygame.draw.circle(self.screen, (255, 255, 0),
-                                         (center_x, center_y),
-                                         piece_radius, 2)
-                    
-                    # 绘制棋子图片
-                    image = self.piece_images.get((piece.type, piece.player))
-                    if image:
-                        # 计算图片缩放尺寸（填充圆形区域）
-                        scaled_size = int(piece_radius * 1.618)  # 调整图片缩放比例
-                        scaled_image = pygame.transform.scale(image, (scaled_size, scaled_size))
-                        # 计算图片位置（居中显示）
-                        image_rect = scaled_image.get_rect()
-                        image_rect.center = (center_x, center_y)
-                        self.screen.blit(scaled_image, image_rect)
-                    else:
-                        # 如果没有找到图片，使用文字作为后备显示
-                        piece_name = {
-                            PieceType.ELEPHANT: '象',
-                            PieceType.LION: '狮',
-                            PieceType.TIGER: '虎',
-                            PieceType.LEOPARD: '豹',
-                            PieceType.WOLF: '狼',
-                            PieceType.DOG: '狗',
-                            PieceType.CAT: '猫',
-                            PieceType.RAT: '鼠'
-                        }[piece.type]
-                        text = self.font.render(piece_name, True, self.TEXT_COLOR)
-                        text_rect = text.get_rect(center=(center_x, center_y))
-                        self.screen.blit(text, text_rect)
+                    content = (piece.type, piece.player, piece is self.selected_piece, self.animation_offset(piece))
+                cells.append((content, (row, col) in highlights))
+        return cells, self.current_player, self.winner, self.WINDOW_SIZE, self.CELL_SIZE
+
+
+    def render(self):
+        # 与上一帧比较，只重画并提交发生变化的格子与边框；
+        # 首帧、胜负变化、窗口变化或被遮挡后整窗重画
+        snapshot = self.render_state()
+        previous = self.last_render_state
+        self.last_render_state = snapshot
+        # 叠加层打开时每帧都重画它所在的区域
+        overlay = self.build_overlay() if self.show_overlay else None
+        if self.full_redraw or previous is None or previous[2:] != snapshot[2:]:
+            self.full_redraw = False
+            self.draw_board()
+            if self.winner:
+                self.draw_winner()
+            if overlay:
+                self.draw_overlay(overlay)
+            self.present()
+            return
+
+        rects = [self.cell_rect(*divmod(i, 7))
+                 for i, (old, new) in enumerate(zip(previous[0], snapshot[0])) if old != new]
+        if previous[1] != snapshot[1]:
+            rects.extend(self.border_rects())
+        if overlay:
+            # 上一帧与本帧叠加层的并集，文字变短时也能擦掉旧的
+            rect = overlay.get_rect(topleft=self.OVERLAY_POS)
+            rects.append(rect.union(self.overlay_rect) if self.overlay_rect else rect)
+        if rects:
+            self.draw_board(rects)
+            if overlay:
+                self.draw_overlay(overlay)
+            self.present(rects)
+
+
+    def present(self, rects=None):
+        # 把画好的内容提交到窗口：rects 为空时整窗提交
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+
+    def toggle_overlay(self):
+        # F3：显示或隐藏性能叠加层；没有要求导出剖析结果时，隐藏后恢复原来的方法
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.profiler.enable()
+            if self.overlay_font is None:
+                try:
+                    self.overlay_font = pygame.font.Font(self.font_path, 16)
+                except (OSError, pygame.error):
+                    self.overlay_font = pygame.font.Font(None, 18)
+        elif not self.profile_path:
+            self.profiler.disable()
+        self.overlay_rect = None
+        self.full_redraw = True
+
+
+    def build_overlay(self):
+        # 叠加层：帧率、最近若干帧每帧各阶段的平均耗时与规则调用次数
+        phases, counters = self.profiler.recent()
+        lines = [f'FPS {self.profiler.fps():.1f}']
+        for _, phase, label in PROFILE_PHASES:
+            lines.append(f'{label} {phases.get(phase, 0.0):.2f}ms')
+        for counter, calls in counters.items():
+            lines.append(f'{counter} {calls:.0f}/帧')
+        line_height = self.overlay_font.get_linesize()
+        rendered = [self.overlay_font.render(line, True, self.TEXT_COLOR) for line in lines]
+        padding = 4
+        surface = pygame.Surface((max(text.get_width() for text in rendered) + 2 * padding,
+                                  line_height * len(rendered) + 2 * padding), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        for i, text in enumerate(rendered):
+            surface.blit(text, (padding, padding + i * line_height))
+        return surface
+
+
+    def draw_overlay(self, overlay):
+        self.overlay_rect = self.screen.blit(overlay, self.OVERLAY_POS)
     
 
+    def start_animation(self, pieces):
+        # 刚走动的棋子左右摆动几次，方便看清上一步（尤其是电脑的着法）
+        self.animation_pieces = list(pieces)
+        self.animation_frame = 0
+        self.animation_count = 0
+
+
+    def stop_animation(self):
+        self.animation_pieces = []
+
+
+    def is_animating(self):
+        return bool(self.animation_pieces)
+
+
+    def advance_animation(self):
+        # 每帧推进一次；摆动 ANIMATION_REPEATS 次后结束
+        if not self.animation_pieces:
+            return
+        self.animation_frame += 1
+        if self.animation_frame >= self.ANIMATION_FRAMES:
+            self.animation_frame = 0
+            self.animation_count += 1
+            if self.animation_count >= self.ANIMATION_REPEATS:
+                self.stop_animation()
+
+
+    def animation_offset(self, piece):
+        # 摆动中的棋子水平偏移的像素数；幅度很小，棋子不会画出自己的格子
+        if piece not in self.animation_pieces:
+            return 0
+        amplitude = self.CELL_SIZE // 16
+        return round(amplitude * math.sin(2 * math.pi * self.animation_frame / self.ANIMATION_FRAMES))
+
+
     def get_board_position(self, mouse_pos):
-        # 计算棋盘的起始位置
-        start_x = (self.WINDOW_SIZE[0] - 7 * self.CELL_SIZE) // 2
-        start_y = (self.WINDOW_SIZE[1] - 9 * self.CELL_SIZE) // 2
+        # 计算棋盘的起始位置（与绘制使用同一个窗口大小与格子大小）
+        start_x, start_y = self.board_origin()
         
         # 计算鼠标位置对应的棋盘格子
         x, y = mouse_pos
@@ -506,183 +718,318 @@ class DouShouQi:
         return None
     
 
-    def run(self):
+    def run(self, ai_player=None, ai_time_ms=1000, fps=60, frame_stats=False, tablebase=None, book=None,
+            connect=None, room=None, startup_stats=False, profile=None):
+        # ai_player 为 'red' 或 'blue' 时为人机模式，电脑执该方，每步限时 ai_time_ms 毫秒
+        # 没有动画和拖动时主循环阻塞等待事件；frame_stats 为真时退出前打印帧耗时统计
+        # tablebase 与 book 为残局库与开局库文件，电脑在残局和开局中查表走棋
+        # connect 为服务器地址（'主机:端口' 或 'unix:路径'）时联网对战，room 为房间名
+        # startup_stats 为真时在第一帧画完后打印启动耗时
+        # profile 为文件名时从一开始就剖析各阶段耗时，退出时写成JSON（F3 叠加层可随时查看）
+        # 搜索、残局库、开局库与联网模块只在用到时才导入，不拖慢普通启动
+        self.ai_player = ai_player
+        self.ai_time_ms = ai_time_ms
+        if ai_player:
+            from ai import AlphaBetaSearcher
+            tb = opening_book = None
+            if tablebase:
+                from tablebase import Tablebase
+                tb = Tablebase(tablebase)
+            if book:
+                from book import OpeningBook
+                opening_book = OpeningBook(book)
+            self.ai_searcher = AlphaBetaSearcher(tablebase=tb, book=opening_book)
+        if connect:
+            from netclient import NetworkClient
+            self.net = NetworkClient(connect, on_message=lambda: pygame.event.post(pygame.event.Event(NET_EVENT)))
+            self.net.join(room)
+        if profile:
+            self.profile_path = profile
+            self.profiler.enable()
+        scheduler = FrameScheduler(fps)
+
+        events = []
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                
-                # 处理鼠标事件
-                if not self.winner:  # 只有在游戏未结束时才处理移动
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        pos = self.get_board_position(event.pos)
-                        if pos:
-                            row, col = pos
-                            piece = self.board[row][col]
-                            if piece and piece.player == self.current_player:
-                                # 选中棋子时就显示可移动位置
-                                self.selected_piece = piece
-                                piece.selected = True
-                                self.dragging = True
-                                self.drag_pos = event.pos
-                
-                if event.type == pygame.MOUSEMOTION:
-                    if self.dragging:
-                        self.drag_pos = event.pos
-                
-                if event.type == pygame.MOUSEBUTTONUP:
-                    if self.dragging:
-                        pos = self.get_board_position(event.pos)
-                        if pos and self.selected_piece:
-                            row, col = pos
-                            old_row, old_col = self.selected_piece.pos
-                            
-                            # 检查移动是否合法
-                            if self.selected_piece.can_move(pos, self.board):
-                                # 如果目标位置有对方棋子
-                                target_piece = self.board[row][col]
-                                old_pos = self.selected_piece.pos
-                                
-                                if target_piece:
-                                    if self.selected_piece.can_capture(target_piece, self.board):
-                                        # 吃掉对方棋子
-                                        self.board[row][col] = self.selected_piece
-                                        self.board[old_row][old_col] = None
-                                        self.selected_piece.pos = pos
-                                        self.log_move(self.selected_piece, old_pos, pos, target_piece)
-                                        self.current_player = 'blue' if self.current_player == 'red' else 'red'
-                                else:
-                                    # 移动到空位置
-                                    self.board[row][col] = self.selected_piece
-                                    self.board[old_row][old_col] = None
-                                    self.selected_piece.pos = pos
-                                    self.log_move(self.selected_piece, old_pos, pos)
-                                    self.current_player = 'blue' if self.current_player == 'red' else 'red'
-                                
-                                # 检查胜利条件
-                                winner = self.check_win()
-                                if winner:
-                                    self.winner = winner
-                                    winner_text = '红方胜利' if winner == 'red' else '蓝方胜利'
-                                    self.log_file.write('\n' + winner_text + '\n')
-                        
-                        if self.selected_piece:
-                            self.selected_piece.selected = False
-                        self.dragging = False
-                        self.selected_piece = None
-                        self.drag_pos = None
-            
-            # 绘制游戏界面
-            self.draw_board()
+            if self.handle_events(events):
+                if frame_stats:
+                    print(scheduler.report())
+                self.quit()
+
+            # 人机模式：取回电脑的着法，或开始新的思考；联网模式：处理服务器消息
+            self.update_ai()
+            self.update_network()
+            self.update_scaling()
+            self.advance_animation()
+
+            # 绘制游戏界面（只提交变化的区域）
+            self.render()
+            scheduler.end_frame()
+            if self.profiler.enabled:
+                self.profiler.end_frame()
+            if self.startup:
+                self.startup.mark('首帧')
+                if startup_stats:
+                    print(self.startup.report())
+                self.startup = None
+
+            # 等待下一帧：动画、拖动或显示叠加层时按帧率刷新，否则阻塞到有新事件
+            events = scheduler.wait(self.is_animating() or self.dragging or self.show_overlay)
+
+
+    def quit(self):
+        # 保存棋谱与日志、写出剖析结果后退出
+        self.save_record()
+        self.logger.close()
+        if self.net:
+            self.net.close()
+        if self.profile_path:
+            self.profiler.export_json(self.profile_path)
+            print(self.profiler.report())
+        pygame.quit()
+        sys.exit()
+
+
+    def handle_events(self, events):
+        # 处理本帧的事件；收到退出事件时返回 True
+        for event in events:
+            if event.type == pygame.QUIT:
+                return True
+
+            # 窗口被遮挡后恢复：整窗重画
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_redraw = True
+
+            # 窗口大小变化，F11 切换全屏
+            if event.type == pygame.VIDEORESIZE and not self.fullscreen:
+                self.resize_window()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                self.toggle_fullscreen()
+            # F3 显示或隐藏性能叠加层
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_overlay()
+
+            # 处理鼠标事件
+            if not self.winner:  # 只有在游戏未结束时才处理移动
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    pos = self.get_board_position(event.pos)
+                    if pos:
+                        row, col = pos
+                        piece = self.board[row][col]
+                        if piece and piece.player == self.current_player and self.is_human_turn():
+                            # 选中棋子时就显示可移动位置
+                            self.selected_piece = piece
+                            self.dragging = True
+                            self.drag_pos = event.pos
             
-            # 如果有获胜方，显示获胜信息
-            if self.winner:
-                winner_text = '红方胜利' if self.winner == 'red' else '蓝方胜利'
-                winner_surface = self.winner_font.render(winner_text, True,
-                                                       self.RED_COLOR if self.winner == 'red' else self.BLUE_COLOR)
-                text_rect = winner_surface.get_rect(center=(self.WINDOW_SIZE[0] // 2, self.WINDOW_SIZE[1] // 2))
-                self.screen.blit(winner_surface, text_rect)
+            # 悔棋与重做：Ctrl+Z / Ctrl+Y
+            if event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                if event.key == pygame.K_z:
+                    self.undo_move()
+                elif event.key == pygame.K_y:
+                    self.redo_move()
+
+            if event.type == pygame.MOUSEMOTION:
+                if self.dragging:
+                    self.drag_pos = event.pos
             
-            pygame.display.flip()
+            if event.type == pygame.MOUSEBUTTONUP:
+                if self.dragging:
+                    pos = self.get_board_position(event.pos)
+                    if pos and self.selected_piece:
+                        # 检查移动是否合法
+                        move = (self.selected_piece.pos, pos)
+                        if self.is_legal_move(move):
+                            if self.net:
+                                # 联网时由服务器确认后再走子
+                                self.net.send_move(move)
+                            else:
+                                self.redo_stack = []
+                                self.play_move(move)
+
+                    self.dragging = False
+                    self.selected_piece = None
+                    self.drag_pos = None
+        return False
+
+
+    def play_move(self, move):
+        # 执行着法并记录日志
+        old_pos, new_pos = move
+        piece = self.state.get_piece(old_pos)
+        target_piece = self.state.apply_move(move)
+        self.log_move(piece, old_pos, new_pos, target_piece)
+        self.start_animation([piece])
+
+        # 检查胜利条件
+        if self.winner:
+            self.logger.log_result(self.winner)
+
+
+    def is_ai_turn(self):
+        return self.ai_player is not None and not self.winner and self.current_player == self.ai_player
+
+
+    def update_ai(self):
+        # 后台线程搜索完成后，只有局面未变（没有悔棋）时才执行它的着法
+        while not self.ai_results.empty():
+            position_hash, move = self.ai_results.get_nowait()
+            self.ai_thread = None
+            if move and position_hash == self.state.hash and self.is_ai_turn():
+                self.redo_stack = []
+                self.play_move(move)
+
+        if self.is_ai_turn() and self.ai_thread is None:
+            position = self.state.copy()
+            self.ai_thread = threading.Thread(target=self.ai_think, args=(position,), daemon=True)
+            self.ai_thread.start()
+
+
+    def is_human_turn(self):
+        # 本地玩家能否走当前行棋方的棋子
+        if self.net:
+            return self.net_color == self.current_player
+        return not self.is_ai_turn()
+
+
+    def update_network(self):
+        # 服务器推送的局面是权威局面：对得上的着法照常走子（有动画和日志），否则直接同步局面
+        if not self.net:
+            return
+        while not self.net.messages.empty():
+            message = self.net.messages.get_nowait()
+            kind = message['type']
+            if kind == 'start':
+                self.net_color = message['color']
+                pygame.display.set_caption('斗兽棋 - 联网对战（' + ('红方' if self.net_color == 'red' else '蓝方') + '）')
+            elif kind == 'state':
+                last = message['last']
+                if last and message['ply'] == len(self.state.history) + 1:
+                    self.play_move((tuple(last[0]), tuple(last[1])))
+                elif message['position'] != self.state.to_text():
+                    self.stop_animation()
+                    self.state = GameState.from_text(message['position'])
+                    self.record_start = message['position']
+                    self.full_redraw = True
+                if message['finished']:
+                    # 对局已结束（end 消息随后到达），不再允许走子
+                    self.net_color = None
+            elif kind == 'end':
+                # 认输、断线等不是由着法决定的胜负
+                if message['winner'] and not self.winner:
+                    self.state.winner = message['winner']
+                    self.logger.log_result(self.winner)
+                    self.full_redraw = True
+                self.net_color = None
+            elif kind == 'error':
+                print(f"服务器：{message['message']}")
+            elif kind == 'closed':
+                print('与服务器的连接已断开')
+                self.net_color = None
+
+
+    def ai_think(self, position):
+        result = self.ai_searcher.search(position, time_ms=self.ai_time_ms)
+        self.ai_results.put((position.hash, result.move))
+        pygame.event.post(pygame.event.Event(AI_DONE_EVENT))
+
+
+    def undo_move(self):
+        # 悔棋：撤销上一步着法，放入重做栈；人机模式下一直撤销到轮到玩家；联网时不能悔棋
+        if self.net or self.dragging or not self.state.history:
+            return
+        self.stop_animation()
+        self.undo_one_move()
+        while self.is_ai_turn() and self.state.history:
+            self.undo_one_move()
+
+
+    def undo_one_move(self):
+        token = self.state.history[-1]
+        self.state.unmake_move(token)
+        move = token[:2]
+        self.redo_stack.append(move)
+        old_pos, new_pos = move
+        self.logger.log_undo(self.state.get_piece(old_pos).player, old_pos, new_pos, token[2])
+
+
+    def redo_move(self):
+        # 重做被悔掉的着法；人机模式下连同电脑的应着一起重做
+        if self.net or self.dragging or not self.redo_stack:
+            return
+        self.play_move(self.redo_stack.pop())
+        while self.is_ai_turn() and self.redo_stack:
+            self.play_move(self.redo_stack.pop())
+
+
+    def save_record(self, path='games.dsq'):
+        # 退出时把本局着法追加到二进制棋谱文件（未分胜负的对局结果记为未知）；
+        # 联网时重新同步过局面的，从同步的局面开始记录
+        if not self.state.history:
+            return
+        moves = [token[:2] for token in self.state.history]
+        metadata = {'source': 'main', 'ai': self.ai_player} if self.ai_player else {'source': 'main'}
+        with RecordWriter(path) as writer:
+            writer.write_game(moves, self.winner, metadata, start=self.record_start)
 
 
     def save_board_state(self):
         # 保存当前棋盘状态
-        state = []
-        for row in range(9):
-            for col in range(7):
-                piece = self.board[row][col]
-                if piece:
-                    state.append({
-                        'type': piece.type,
-                        'player': piece.player,
-                        'pos': piece.pos
-                    })
-        return {
-            'board': state,
-            'current_player': self.current_player
-        }
+        return self.state.save_state()
 
 
     def restore_board_state(self, state):
         # 恢复棋盘状态
-        self.board = [[None for _ in range(7)] for _ in range(9)]
-        for piece_data in state['board']:
-            piece = Piece(piece_data['type'], piece_data['player'], piece_data['pos'])
-            row, col = piece_data['pos']
-            self.board[row][col] = piece
-        self.current_player = state['current_player']
+        self.state.restore_state(state)
     
 
     def load_piece_images(self):
-        # 加载所有棋子的PNG图片
-        piece_size = (self.CELL_SIZE * 0.618, self.CELL_SIZE * 0.618)  # 棋子图片大小为格子的一半
-        print(self.CELL_SIZE, piece_size)
-        piece_names = {
-            PieceType.ELEPHANT: 'elephant',
-            PieceType.LION: 'lion',
-            PieceType.TIGER: 'tiger',
-            PieceType.LEOPARD: 'leopard',
-            PieceType.WOLF: 'wolf',
-            PieceType.DOG: 'dog',
-            PieceType.CAT: 'cat',
-            PieceType.RAT: 'rat'
-        }
-        
-        # 加载棋子图片
-        for piece_type in PieceType:
+        # 解码所有原图：优先从图集（build_atlas.py 生成）中取，没有图集时逐个加载PNG；
+        # 按格子大小的缩放由 scale_images 完成，改变窗口大小时不需要重新解码
+        # （格子大于图集尺寸时才在 source_image 中按需解码原始PNG）
+        atlas = load_atlas()
+        for name in list(PIECE_IMAGE_NAMES.values()) + list(BOARD_IMAGE_NAMES):
+            if atlas and name in atlas:
+                self.source_images[name] = atlas[name]
+                self.atlas_names.add(name)
+                continue
+            image_path = os.path.join('images', f'{name}.png')
             try:
-                image_path = os.path.join('images', f'{piece_names[piece_type]}.png')
-                image = load_image(image_path, piece_size)
-                # 为红蓝双方都使用相同的图片
-                self.piece_images[(piece_type, 'red')] = image
-                self.piece_images[(piece_type, 'blue')] = image
+                self.source_images[name] = load_image(image_path)
             except FileNotFoundError:
                 print(f"警告：找不到图片文件：{image_path}")
-                self.piece_images[(piece_type, 'red')] = None
-                self.piece_images[(piece_type, 'blue')] = None
-        
-        # 加载陷阱、兽穴、河流和草地图片
-        try:
-            trap_image = load_image(os.path.join('images', 'trap.png'), (self.CELL_SIZE, self.CELL_SIZE))
-            den_image = load_image(os.path.join('images', 'den.png'), (self.CELL_SIZE, self.CELL_SIZE))
-            water_image = load_image(os.path.join('images', 'water.png'), (self.CELL_SIZE, self.CELL_SIZE))
-            tile_image = load_image(os.path.join('images', 'tile.png'), (self.CELL_SIZE, self.CELL_SIZE))
-            self.piece_images['trap'] = trap_image
-            self.piece_images['den'] = den_image
-            self.piece_images['water'] = water_image
-            self.piece_images['tile'] = tile_image
-        except FileNotFoundError as e:
-            print(f"警告：找不到特殊区域图片文件：{e}")
-            self.piece_images['trap'] = None
-            self.piece_images['den'] = None
-            self.piece_images['water'] = None
-            self.piece_images['tile'] = None
+                self.source_images[name] = None
 
 
     def init_pieces(self):
-        # 初始化蓝方棋子
-        self.board[0][0] = Piece(PieceType.LION, 'blue', (0, 0))
-        self.board[0][6] = Piece(PieceType.TIGER, 'blue', (0, 6))
-        self.board[1][1] = Piece(PieceType.DOG, 'blue', (1, 1))
-        self.board[1][5] = Piece(PieceType.CAT, 'blue', (1, 5))
-        self.board[2][0] = Piece(PieceType.RAT, 'blue', (2, 0))
-        self.board[2][2] = Piece(PieceType.LEOPARD, 'blue', (2, 2))
-        self.board[2][4] = Piece(PieceType.WOLF, 'blue', (2, 4))
-        self.board[2][6] = Piece(PieceType.ELEPHANT, 'blue', (2, 6))
-
-        # 初始化红方棋子
-        self.board[8][6] = Piece(PieceType.LION, 'red', (8, 6))
-        self.board[8][0] = Piece(PieceType.TIGER, 'red', (8, 0))
-        self.board[7][5] = Piece(PieceType.DOG, 'red', (7, 5))
-        self.board[7][1] = Piece(PieceType.CAT, 'red', (7, 1))
-        self.board[6][6] = Piece(PieceType.RAT, 'red', (6, 6))
-        self.board[6][4] = Piece(PieceType.LEOPARD, 'red', (6, 4))
-        self.board[6][2] = Piece(PieceType.WOLF, 'red', (6, 2))
-        self.board[6][0] = Piece(PieceType.ELEPHANT, 'red', (6, 0))
+        # 初始化棋子位置
+        self.state = GameState()
 
 
 if __name__ == '__main__':
-    game = DouShouQi()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='斗兽棋')
+    parser.add_argument('--ai', choices=['red', 'blue'], help='人机对战，电脑执红方或蓝方')
+    parser.add_argument('--ai-time', type=int, default=1000, help='电脑每步思考时间（毫秒）')
+    parser.add_argument('--fps', type=int, default=60, help='动画与拖动时的最高帧率')
+    parser.add_argument('--frame-stats', action='store_true', help='退出时打印帧耗时统计')
+    parser.add_argument('--log-format', choices=['text', 'jsonl'], default='text',
+                        help='game_log.txt 的格式：中文可读文本或每行一条JSON')
+    parser.add_argument('--tablebase', help='电脑使用的残局库文件（由 tablebase.py 生成）')
+    parser.add_argument('--book', help='电脑使用的开局库文件（由 book.py 生成）')
+    parser.add_argument('--connect', help='联网对战：服务器地址，如 127.0.0.1:8765 或 unix:/tmp/dsq.sock')
+    parser.add_argument('--room', help='联网对战时进入的房间，不指定则与下一个排队的玩家配对')
+    parser.add_argument('--startup-stats', action='store_true', help='打印各阶段启动耗时')
+    parser.add_argument('--fullscreen', action='store_true', help='全屏启动（F11 切换全屏与窗口）')
+    parser.add_argument('--profile', help='剖析各阶段耗时与规则调用次数，退出时写入该JSON文件')
+    parser.add_argument('--cprofile', help='在 cProfile 下运行，退出时写入该文件（用 pstats 查看）')
+    args = parser.parse_args()
+
+    startup = StartupTimer(STARTUP_START)
+    startup.mark('导入模块')
+    game = DouShouQi(log_format=args.log_format, startup=startup, fullscreen=args.fullscreen)
+    options = dict(ai_player=args.ai, ai_time_ms=args.ai_time, fps=args.fps, frame_stats=args.frame_stats,
+                   tablebase=args.tablebase, book=args.book, connect=args.connect, room=args.room,
+                   startup_stats=args.startup_stats, profile=args.profile)
+    if args.cprofile:
+        run_cprofile(game.run, args.cprofile, **options)
+    else:
+        game.run(**options)
\ No newline at end of file
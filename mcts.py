@@ -0,0 +1,288 @@
+"""蒙特卡洛树搜索（UCT/PUCT）电脑对手，随机模拟可以分发到多个进程
+
+模拟对局在 bitboard.BitBoard 上进行，吃子关系同样来自 Piece.can_capture，
+陷阱中棋子战斗力为0、鼠吃象等规则与规则引擎一致。
+
+并行方式：
+- 'serial'：单进程
+- 'root'：每个进程独立建树，最后合并根节点各着法的访问次数与胜率
+- 'leaf'：主进程建树，每轮选出一批叶子（带虚拟损失），把模拟分发给进程池
+"""
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitBoard, DEN, position
+
+MODES = ('serial', 'root', 'leaf')
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins', 'mover', 'prior')
+
+    def __init__(self, move, parent, mover, prior=1.0):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        # 从走出这一步的一方（mover）看的累计得分：胜1、和0.5
+        self.wins = 0.0
+        self.mover = mover
+        self.prior = prior
+
+
+def rollout(bb, rng, max_plies):
+    """在局面副本上随机走子直到分出胜负，返回胜方（0红1蓝），超过步数上限返回None"""
+    bb = bb.copy()
+    for _ in range(max_plies):
+        if bb.winner is not None:
+            return bb.winner
+        moves = bb.legal_moves()
+        if not moves:
+            # 无子可动的一方判负
+            return 1 - bb.side
+        bb.play(moves[rng.randrange(len(moves))])
+    return bb.winner
+
+
+def _priors(bb, moves):
+    # PUCT的先验：吃子与进兽穴的着法权重更高，其余均匀
+    enemy = bb.occ[1 - bb.side]
+    den = DEN[1 - bb.side]
+    weights = []
+    for _, to in moves:
+        bit = 1 << to
+        weights.append(8.0 if bit & den else 3.0 if bit & enemy else 1.0)
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+class Tree:
+    """单棵搜索树"""
+
+    def __init__(self, bb, c=1.4, selection='uct', max_rollout_plies=200, rng=None):
+        self.root_bb = bb
+        self.root = Node(None, None, 1 - bb.side)
+        self.c = c
+        self.selection = selection
+        self.max_rollout_plies = max_rollout_plies
+        self.rng = rng or random.Random()
+
+    def _expand_moves(self, node, bb):
+        moves = bb.legal_moves()
+        if self.selection == 'puct' and moves:
+            node.untried = list(zip(moves, _priors(bb, moves)))
+        else:
+            node.untried = [(move, 1.0) for move in moves]
+        self.rng.shuffle(node.untried)
+
+    def _select_child(self, node):
+        log_n = math.log(node.visits or 1)
+        sqrt_n = math.sqrt(node.visits or 1)
+        c = self.c
+        best = None
+        best_value = -1.0
+        for child in node.children:
+            q = child.wins / child.visits if child.visits else 0.5
+            if self.selection == 'puct':
+                value = q + c * child.prior * sqrt_n / (1 + child.visits)
+            else:
+                value = q + c * math.sqrt(log_n / child.visits) if child.visits else float('inf')
+            if value > best_value:
+                best_value = value
+                best = child
+        return best
+
+    def select_leaf(self, virtual_loss=False):
+        """从根出发选择并扩展一个叶子，返回 (叶子, 叶子局面)"""
+        node = self.root
+        bb = self.root_bb.copy()
+        while True:
+            if virtual_loss:
+                node.visits += 1
+            if bb.winner is not None:
+                return node, bb
+            if node.untried is None:
+                self._expand_moves(node, bb)
+            if node.untried:
+                move, prior = node.untried.pop()
+                child = Node(move, node, bb.side, prior)
+                node.children.append(child)
+                bb.play(move)
+                if virtual_loss:
+                    child.visits += 1
+                return child, bb
+            if not node.children:
+                return node, bb
+            node = self._select_child(node)
+            bb.play(node.move)
+
+    def backpropagate(self, node, winner, virtual_loss=False):
+        while node is not None:
+            if not virtual_loss:
+                node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1.0
+            node = node.parent
+
+    def leaf_result(self, bb):
+        # 叶子本身已终局时不需要模拟
+        if bb.winner is not None:
+            return bb.winner
+        return rollout(bb, self.rng, self.max_rollout_plies)
+
+    def run(self, playouts):
+        for _ in range(playouts):
+            leaf, bb = self.select_leaf()
+            self.backpropagate(leaf, self.leaf_result(bb))
+
+    def root_stats(self):
+        return {child.move: (child.visits, child.wins) for child in self.root.children}
+
+
+def _root_worker(bb, playouts, seed, c, selection, max_rollout_plies):
+    tree = Tree(bb, c, selection, max_rollout_plies, random.Random(seed))
+    tree.run(playouts)
+    return tree.root_stats()
+
+
+def _rollout_worker(bb, seed, max_plies):
+    return rollout(bb, random.Random(seed), max_plies)
+
+
+class MCTSPlayer:
+    """MCTS电脑对手
+
+    playouts 为每步的模拟次数预算；workers 为进程数；mode 为 'serial'、'root' 或 'leaf'。
+    reuse_tree 为真时在相邻两步之间复用搜索树，只有单进程与叶并行模式支持：根并行的树建在
+    各个工作进程中，每步搜索完就丢弃。默认（None）在支持的模式下复用。
+    """
+
+    def __init__(self, playouts=2000, workers=1, mode='root', c=1.4, selection='uct',
+                 max_rollout_plies=200, seed=None, reuse_tree=None):
+        if mode not in MODES:
+            raise ValueError(f'未知的并行方式：{mode}')
+        if workers <= 1:
+            mode = 'serial'
+        if reuse_tree is None:
+            reuse_tree = mode != 'root'
+        elif reuse_tree and mode == 'root':
+            raise ValueError('根并行模式不能复用搜索树，请改用 leaf 模式或 reuse_tree=False')
+        self.playouts = playouts
+        self.workers = workers
+        self.mode = mode
+        self.c = c
+        self.selection = selection
+        self.max_rollout_plies = max_rollout_plies
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.tree = None
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _pool(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def choose_move(self, state):
+        """为引擎局面 GameState 选择着法，返回 ((row, col), (row, col))"""
+        bb = BitBoard.from_state(state)
+        if self.mode == 'root':
+            stats = self._search_root_parallel(bb)
+        else:
+            tree = self._reuse_or_new_tree(bb)
+            if self.mode == 'leaf':
+                self._search_leaf_parallel(tree)
+            else:
+                tree.run(self.playouts)
+            stats = tree.root_stats()
+        if not stats:
+            return None
+        move = max(stats, key=lambda m: stats[m][0])
+        if self.reuse_tree and self.tree is not None:
+            self._descend(move)
+        return position(move[0]), position(move[1])
+
+    def _reuse_or_new_tree(self, bb):
+        key = bb.key()
+        tree = self.tree
+        if self.reuse_tree and tree is not None:
+            if tree.root_bb.key() == key:
+                return tree
+            # 对手刚走了一步：在子节点中找到对应的局面
+            for child in tree.root.children:
+                child_bb = tree.root_bb.copy()
+                child_bb.play(child.move)
+                if child_bb.key() == key:
+                    child.parent = None
+                    tree.root = child
+                    tree.root_bb = child_bb
+                    return tree
+        self.tree = Tree(bb, self.c, self.selection, self.max_rollout_plies,
+                         random.Random(self.rng.getrandbits(64)))
+        return self.tree
+
+    def _descend(self, move):
+        tree = self.tree
+        for child in tree.root.children:
+            if child.move == move:
+                child.parent = None
+                tree.root_bb = tree.root_bb.copy()
+                tree.root_bb.play(move)
+                tree.root = child
+                return
+        self.tree = None
+
+    def _search_root_parallel(self, bb):
+        pool = self._pool()
+        share, extra = divmod(self.playouts, self.workers)
+        futures = []
+        for i in range(self.workers):
+            playouts = share + (1 if i < extra else 0)
+            futures.append(pool.submit(_root_worker, bb, playouts, self.rng.getrandbits(64),
+                                       self.c, self.selection, self.max_rollout_plies))
+        merged = {}
+        for future in futures:
+            for move, (visits, wins) in future.result().items():
+                total_visits, total_wins = merged.get(move, (0, 0.0))
+                merged[move] = (total_visits + visits, total_wins + wins)
+        return merged
+
+    def _search_leaf_parallel(self, tree):
+        pool = self._pool()
+        done = 0
+        while done < self.playouts:
+            batch = min(self.workers, self.playouts - done)
+            leaves = [tree.select_leaf(virtual_loss=True) for _ in range(batch)]
+            futures = []
+            for leaf, bb in leaves:
+                if bb.winner is not None:
+                    futures.append(None)
+                else:
+                    futures.append(pool.submit(_rollout_worker, bb, self.rng.getrandbits(64),
+                                               self.max_rollout_plies))
+            for (leaf, bb), future in zip(leaves, futures):
+                winner = bb.winner if future is None else future.result()
+                tree.backpropagate(leaf, winner, virtual_loss=True)
+            done += batch
+
+
+def mcts_search(state, playouts=2000, workers=1, mode='root', seed=None):
+    """库函数：用MCTS为当前行棋方选择着法"""
+    with MCTSPlayer(playouts=playouts, workers=workers, mode=mode, seed=seed, reuse_tree=False) as player:
+        return player.choose_move(state)
+
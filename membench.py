@@ -0,0 +1,96 @@
+"""局面内存占用基准：比较几种局面表示每个局面占用的字节数
+
+用随机对局产生一批局面，分别以下列形式各保存 N 份，用 tracemalloc 统计新增内存：
+    GameState.copy()        完整的规则对象（棋盘列表 + Piece 对象）
+    字典列表快照             改动之前 save_state 的格式：每个棋子一个字典
+    Position                save_state 返回的紧凑局面（63 字节 + 行棋方）
+    BitBoard                位棋盘
+
+用法示例：
+    python membench.py
+    python membench.py --count 20000 --json
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from engine import GameState, Position
+from bitboard import BitBoard
+
+
+def sample_states(count, seed=0):
+    """随机对局中的局面（各不相同的 GameState 对象）"""
+    rng = random.Random(seed)
+    states = []
+    state = GameState()
+    while len(states) < count:
+        moves = state.legal_moves()
+        if not moves or len(state.history) >= 200:
+            state = GameState()
+            continue
+        state.make_move(rng.choice(moves))
+        states.append(state.copy())
+    return states
+
+
+def dict_snapshot(state):
+    # 改动之前 save_state 返回的格式，作为对照
+    return {
+        'board': [{'type': piece.type, 'player': piece.player, 'pos': piece.pos} for piece in state.pieces()],
+        'current_player': state.current_player,
+    }
+
+
+REPRESENTATIONS = {
+    'GameState.copy()': lambda state: state.copy(),
+    '字典列表快照': dict_snapshot,
+    'Position': Position.from_state,
+    'BitBoard': BitBoard.from_state,
+}
+
+
+def measure(make, states, copies):
+    """保存 copies 份局面后新增的内存（字节/局面）与每个局面的构造耗时（微秒）"""
+    # 计时与内存分开测，tracemalloc 会拖慢内存分配
+    start = time.perf_counter()
+    kept = [make(states[i % len(states)]) for i in range(copies)]
+    elapsed = time.perf_counter() - start
+    del kept
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [make(states[i % len(states)]) for i in range(copies)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # 列表本身每项 8 字节的指针不计入
+    size = (after - before) / copies - 8
+    del kept
+    return size, elapsed / copies * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='局面表示的内存占用基准')
+    parser.add_argument('--count', type=int, default=5000, help='每种表示保存的局面数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--json', action='store_true', help='以JSON输出')
+    args = parser.parse_args()
+
+    states = sample_states(min(args.count, 1000), args.seed)
+    results = {}
+    for name, make in REPRESENTATIONS.items():
+        size, micros = measure(make, states, args.count)
+        results[name] = {'bytes_per_position': round(size, 1), 'us_per_position': round(micros, 2)}
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f'局面数：{args.count}')
+    print('表示                   字节/局面   构造耗时（微秒）')
+    for name, result in results.items():
+        width = sum(2 if ord(ch) > 127 else 1 for ch in name)
+        print(f"{name}{' ' * (22 - width)}{result['bytes_per_position']:10.1f}   {result['us_per_position']:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
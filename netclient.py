@@ -0,0 +1,64 @@
+"""联网对战客户端：阻塞套接字加后台读线程，供 pygame 界面使用（协议见 server.py）"""
+import json
+import queue
+import socket
+import threading
+
+from server import encode, parse_address
+
+
+class NetworkClient:
+    """连接服务器；收到的消息放进 messages 队列，并调用 on_message 通知界面线程"""
+
+    def __init__(self, address, on_message=None):
+        kind, *args = parse_address(address)
+        if kind == 'unix':
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(args[0])
+        else:
+            self.sock = socket.create_connection(tuple(args))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.on_message = on_message
+        self.messages = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._reader, name='net-client', daemon=True)
+        self.thread.start()
+
+    def send(self, message):
+        if not self.closed:
+            try:
+                self.sock.sendall(encode(message))
+            except OSError:
+                self.close()
+
+    def join(self, room=None):
+        self.send({'type': 'join', 'room': room} if room else {'type': 'join'})
+
+    def send_move(self, move):
+        (from_row, from_col), (to_row, to_col) = move
+        self.send({'type': 'move', 'from': [from_row, from_col], 'to': [to_row, to_col]})
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _reader(self):
+        # 连接断开时放入一条 {'type': 'closed'}
+        with self.sock.makefile('rb') as f:
+            try:
+                for line in f:
+                    self._deliver(json.loads(line))
+            except (OSError, ValueError):
+                pass
+        self._deliver({'type': 'closed'})
+
+    def _deliver(self, message):
+        self.messages.put(message)
+        if self.on_message:
+            self.on_message()
@@ -0,0 +1,216 @@
+"""着法生成的正确性与速度检查（perft）
+
+perft(n) 统计从某个局面出发走 n 步能到达的叶子数；已分出胜负的局面不再展开。
+参考节点数与基准速度保存在 perft_reference.json 中，修改规则引擎或位棋盘后运行：
+    python perft.py            # 核对节点数（引擎与位棋盘各算一遍）
+    python perft.py --bench    # 同时测速度与内存，并与基准比较
+    python perft.py --update   # 用当前结果重写参考文件
+    python perft.py --position start --depth 3 --divide
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from engine import GameState
+from bitboard import BitBoard
+
+REFERENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perft_reference.json')
+
+# 测试局面：开局，以及河中老鼠挡住跳河、棋子落入陷阱、兽穴旁的攻防、残局
+POSITIONS = {
+    'start': GameState().to_text(),
+    'rat_blocks_jump': 'c6/7/1T3E1/4R2/3L1rt/7/1w2l2/7/6D r',
+    'pieces_in_traps': '1rE4/2cW3/2p4/7/7/7/3R3/2Ct3/4lD1 b',
+    'den_adjacent': '4Re1/2cD3/3l3/7/7/7/7/3eR2/1Tp4 r',
+    'endgame': '7/7/3l3/1r5/R6/3E3/7/7/7 b',
+}
+
+# 速度基准使用的深度
+BENCH_DEPTH = 3
+
+# 比基准慢这么多时给出警告
+SLOWDOWN_TOLERANCE = 0.25
+
+
+def perft(state, depth):
+    """用引擎的 make_move / unmake_move 计数"""
+    if depth == 0:
+        return 1
+    moves = state.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        token = state.make_move(move)
+        nodes += perft(state, depth - 1)
+        state.unmake_move(token)
+    return nodes
+
+
+def perft_bitboard(bb, depth):
+    """用位棋盘计数，结果应与 perft 完全一致"""
+    if depth == 0:
+        return 1
+    moves = bb.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        child = bb.copy()
+        child.play(move)
+        nodes += perft_bitboard(child, depth - 1)
+    return nodes
+
+
+def divide(state, depth):
+    """按第一步着法分别计数，便于定位出错的着法"""
+    result = {}
+    for move in state.legal_moves():
+        token = state.make_move(move)
+        result[move] = perft(state, depth - 1)
+        state.unmake_move(token)
+    return result
+
+
+def load_reference(path=REFERENCE_FILE):
+    if not os.path.exists(path):
+        return {'positions': {}, 'baseline': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_reference(reference, path=REFERENCE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(reference, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def benchmark(text, depth, repeats=3):
+    """返回引擎与位棋盘的每秒节点数，以及一次 perft 的内存占用"""
+    state = GameState.from_text(text)
+    bb = BitBoard.from_state(state)
+    best_engine = best_bitboard = float('inf')
+    nodes = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        nodes = perft(state, depth)
+        best_engine = min(best_engine, time.perf_counter() - start)
+        start = time.perf_counter()
+        perft_bitboard(bb, depth)
+        best_bitboard = min(best_bitboard, time.perf_counter() - start)
+
+    # CPython 没有累计分配次数的计数器：这里记录 perft 过程中的峰值内存，
+    # 以及结束后仍未释放的内存块数（按节点平均），用来发现多余的缓存与泄漏
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    perft(state, depth)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    leaked_blocks = sys.getallocatedblocks() - blocks_before
+    return {
+        'depth': depth,
+        'nodes': nodes,
+        'engine_nodes_per_sec': nodes / best_engine,
+        'bitboard_nodes_per_sec': nodes / best_bitboard,
+        'peak_kib': peak / 1024,
+        'retained_blocks_per_node': leaked_blocks / nodes,
+    }
+
+
+def check(reference, names):
+    ok = True
+    for name in names:
+        entry = reference['positions'].get(name)
+        if not entry:
+            print(f'{name}: 没有参考数据')
+            ok = False
+            continue
+        state = GameState.from_text(entry['position'])
+        bb = BitBoard.from_state(state)
+        for depth, expected in enumerate(entry['counts'], start=1):
+            start = time.perf_counter()
+            nodes = perft(state, depth)
+            elapsed = time.perf_counter() - start
+            bb_nodes = perft_bitboard(bb, depth)
+            status = 'OK' if nodes == expected == bb_nodes else '错误'
+            if status != 'OK':
+                ok = False
+            rate = nodes / elapsed if elapsed else 0
+            print(f'{name:16s} 深度{depth}  {nodes:10d}  期望{expected:10d}  位棋盘{bb_nodes:10d}  '
+                  f'{rate:10.0f} 节点/秒  {status}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋着法生成 perft 检查与基准测试')
+    parser.add_argument('--position', help='只检查某个局面（名称或局面文本）')
+    parser.add_argument('--depth', type=int, help='配合 --position/--divide 指定深度')
+    parser.add_argument('--divide', action='store_true', help='按第一步着法分别计数')
+    parser.add_argument('--bench', action='store_true', help='测量速度与内存并与基准比较')
+    parser.add_argument('--update', action='store_true', help='重新生成参考节点数与基准数据')
+    parser.add_argument('--max-depth', type=int, default=4, help='--update 时开局局面的最大深度')
+    args = parser.parse_args()
+
+    reference = load_reference()
+
+    if args.position and args.position not in POSITIONS:
+        text = args.position
+        state = GameState.from_text(text)
+        depth = args.depth or 3
+        if args.divide:
+            for move, nodes in sorted(divide(state, depth).items()):
+                print(f'{move}: {nodes}')
+        print(f'perft({depth}) = {perft(state, depth)}')
+        return
+
+    names = [args.position] if args.position else list(POSITIONS)
+
+    if args.divide:
+        state = GameState.from_text(POSITIONS[names[0]])
+        depth = args.depth or 3
+        total = 0
+        for move, nodes in sorted(divide(state, depth).items()):
+            print(f'{move}: {nodes}')
+            total += nodes
+        print(f'合计：{total}')
+        return
+
+    if args.update:
+        for name in names:
+            text = POSITIONS[name]
+            state = GameState.from_text(text)
+            max_depth = args.max_depth if name == 'start' else args.max_depth + 1
+            counts = [perft(state, depth) for depth in range(1, max_depth + 1)]
+            reference['positions'][name] = {'position': text, 'counts': counts}
+            reference['baseline'][name] = benchmark(text, BENCH_DEPTH)
+            print(f'{name}: {counts}')
+        save_reference(reference)
+        return
+
+    ok = check(reference, names)
+
+    if args.bench:
+        print()
+        for name in names:
+            result = benchmark(POSITIONS[name], BENCH_DEPTH)
+            baseline = reference['baseline'].get(name)
+            line = (f'{name:16s} 引擎{result["engine_nodes_per_sec"]:10.0f} 节点/秒  '
+                    f'位棋盘{result["bitboard_nodes_per_sec"]:10.0f} 节点/秒  '
+                    f'峰值内存{result["peak_kib"]:8.1f} KiB  '
+                    f'残留{result["retained_blocks_per_node"]:6.3f} 块/节点')
+            if baseline:
+                ratio = result['engine_nodes_per_sec'] / baseline['engine_nodes_per_sec']
+                line += f'  基准的{ratio:.0%}'
+                if ratio < 1 - SLOWDOWN_TOLERANCE:
+                    line += '  警告：明显变慢'
+            print(line)
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""性能剖析：给方法临时套上计时或计数的包装，关闭时把原方法原样放回
+
+先用 time_method / count_method 登记要观察的方法，enable() 时才替换成包装函数，
+disable() 时恢复。关闭状态下被登记的方法就是原来的方法，没有任何额外开销。
+
+计时的阶段按"自身耗时"统计：嵌套调用的内层阶段（如在 draw_board 中调用的
+draw_pieces）的耗时从外层扣除，各阶段相加即为这些阶段占用的总时间。
+计时只用于界面线程的方法；计数可以用在任何线程（如搜索线程中的规则调用），
+多线程同时计数时个别次数可能丢失。
+
+用法示例：
+    profiler = Profiler()
+    profiler.time_method(game, 'draw_board', 'board')
+    profiler.count_method(Piece, 'can_move')
+    profiler.enable()
+    ...                       # 每帧结束时调用 profiler.end_frame()
+    profiler.export_json('profile.json')
+"""
+import functools
+import json
+import time
+from collections import deque
+
+# 叠加层按最近多少帧取平均
+FRAME_WINDOW = 60
+
+
+class PhaseStats:
+    """一个阶段的累计调用次数与自身耗时（秒）"""
+
+    __slots__ = ('calls', 'total', 'max')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Profiler:
+    def __init__(self, frame_window=FRAME_WINDOW):
+        self.enabled = False
+        self.phases = {}
+        self.counters = {}
+        # 登记的方法：(所属对象, 属性名, 'time' 或 'count', 阶段或计数器名)
+        self.hooks = []
+        # 已替换的方法：(所属对象, 属性名, 原来是否在所属对象自己的 __dict__ 中, 原值)
+        self.installed = []
+        # 正在执行的计时阶段中，内层阶段累计的耗时
+        self.stack = []
+        # 当前帧各阶段的自身耗时与计数；最近若干帧的记录
+        self.frame_phases = {}
+        self.frame_counters = {}
+        self.frames = deque(maxlen=frame_window)
+        self.frame_count = 0
+        self.started = None
+        self.elapsed = 0.0
+
+    def time_method(self, owner, attr, phase):
+        """登记 owner.attr 为计时阶段 phase（owner 可以是实例或类）"""
+        self.phases.setdefault(phase, PhaseStats())
+        self.hooks.append((owner, attr, 'time', phase))
+        if self.enabled:
+            self._install(*self.hooks[-1])
+
+    def count_method(self, owner, attr, counter=None):
+        """登记 owner.attr 的调用次数，counter 默认为属性名"""
+        counter = counter or attr
+        self.counters.setdefault(counter, 0)
+        self.hooks.append((owner, attr, 'count', counter))
+        if self.enabled:
+            self._install(*self.hooks[-1])
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started = time.perf_counter()
+        for hook in self.hooks:
+            self._install(*hook)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.elapsed += time.perf_counter() - self.started
+        # 倒序恢复，同一个方法被包装两次时也能回到最初的样子
+        for owner, attr, own, original in reversed(self.installed):
+            if own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+        self.installed = []
+        # 可能是在某个计时阶段内部关闭的（如按键处理中），那个包装函数还会弹出它自己的栈
+        self.stack = []
+        self.frame_phases.clear()
+        self.frame_counters.clear()
+
+    def _install(self, owner, attr, kind, name):
+        own = attr in vars(owner)
+        original = vars(owner)[attr] if own else None
+        func = getattr(owner, attr)
+        # 类上登记的是普通函数，包装后仍是函数，实例调用时照常绑定；实例上登记的是绑定方法
+        wrapper = self._timed(func, name) if kind == 'time' else self._counted(func, name)
+        setattr(owner, attr, functools.wraps(func)(wrapper))
+        self.installed.append((owner, attr, own, original))
+
+    def _timed(self, func, phase):
+        stats = self.phases[phase]
+        stack = self.stack
+        frame_phases = self.frame_phases
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            stack.append(0.0)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                inner = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                own = elapsed - inner
+                stats.calls += 1
+                stats.total += own
+                if own > stats.max:
+                    stats.max = own
+                frame_phases[phase] = frame_phases.get(phase, 0.0) + own
+        return wrapper
+
+    def _counted(self, func, counter):
+        counters = self.counters
+        frame_counters = self.frame_counters
+
+        def wrapper(*args, **kwargs):
+            counters[counter] += 1
+            frame_counters[counter] = frame_counters.get(counter, 0) + 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def end_frame(self):
+        """每帧结束时调用：保存本帧各阶段耗时与计数，供叠加层取平均"""
+        if not self.enabled:
+            return
+        self.frame_count += 1
+        self.frames.append((time.perf_counter(), dict(self.frame_phases), dict(self.frame_counters)))
+        self.frame_phases.clear()
+        self.frame_counters.clear()
+
+    def fps(self):
+        if len(self.frames) < 2:
+            return 0.0
+        span = self.frames[-1][0] - self.frames[0][0]
+        return (len(self.frames) - 1) / span if span > 0 else 0.0
+
+    def recent(self):
+        """最近若干帧中每帧各阶段的平均耗时（毫秒）与各计数器的平均次数"""
+        count = len(self.frames)
+        phases = {phase: 0.0 for phase in self.phases}
+        counters = {counter: 0.0 for counter in self.counters}
+        for _, frame_phases, frame_counters in self.frames:
+            for phase, seconds in frame_phases.items():
+                phases[phase] += seconds
+            for counter, calls in frame_counters.items():
+                counters[counter] += calls
+        if count:
+            phases = {phase: total / count * 1000 for phase, total in phases.items()}
+            counters = {counter: total / count for counter, total in counters.items()}
+        return phases, counters
+
+    def stats(self):
+        elapsed = self.elapsed
+        if self.enabled:
+            elapsed += time.perf_counter() - self.started
+        return {
+            'elapsed_s': elapsed,
+            'frames': self.frame_count,
+            'fps': self.frame_count / elapsed if elapsed else 0.0,
+            'phases': {
+                phase: {
+                    'calls': s.calls,
+                    'total_ms': s.total * 1000,
+                    'avg_ms': s.total / s.calls * 1000 if s.calls else 0.0,
+                    'max_ms': s.max * 1000,
+                    'per_frame_ms': s.total / self.frame_count * 1000 if self.frame_count else 0.0,
+                }
+                for phase, s in self.phases.items()
+            },
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        s = self.stats()
+        lines = [f"剖析时长：{s['elapsed_s']:.1f}秒  帧数：{s['frames']}  平均帧率：{s['fps']:.1f}"]
+        for phase, p in s['phases'].items():
+            lines.append(f"  {phase:<10}调用 {p['calls']:>8}  合计 {p['total_ms']:10.1f}ms  "
+                         f"平均 {p['avg_ms']:.3f}ms  最大 {p['max_ms']:.2f}ms")
+        for counter, calls in s['counters'].items():
+            lines.append(f'  {counter:<14}{calls:>10} 次')
+        return '\n'.join(lines)
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, ensure_ascii=False, indent=2)
+
+
+def run_cprofile(func, path, *args, **kwargs):
+    """在 cProfile 下运行 func，结束时（包括 sys.exit 退出）把结果写入 path，可用 pstats 查看"""
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,181 @@
+"""紧凑的二进制棋谱格式
+
+文件结构（整数均为小端）：
+    文件头 8 字节：b'DSQR'、版本号（1字节）、3字节保留
+    之后依次是各局棋谱，每局：
+        局头 6 字节：结果（1字节）、标志（1字节）、附加信息长度（2字节）、步数（2字节）
+        附加信息：UTF-8 编码的JSON（长度为0时没有）
+        起始局面：标志含 FLAG_START 时为 1字节长度 + 局面文本（GameState.to_text），否则为标准开局
+        着法：每步 2 字节，值为 起点格 << 6 | 终点格，格号 = 行 * 7 + 列
+
+写入用 RecordWriter 逐局追加；读取用 read_games，它把文件映射到内存后逐局生成 GameRecord，
+着法只在访问时才解码，扫描大量对局时内存占用与文件大小无关。
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from engine import COLS, GameState
+
+MAGIC = b'DSQR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3x')
+GAME_HEADER = struct.Struct('<BBHH')
+
+# 约定的棋谱文件扩展名
+SUFFIX = '.dsq'
+
+# 对局结果：红胜、蓝胜、和棋，以及未结束或未知（None）
+RESULT_CODES = {None: 0, 'red': 1, 'blue': 2, 'draw': 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+FLAG_START = 1
+
+# 单局步数上限（步数字段为2字节）
+MAX_PLIES = 0xFFFF
+
+
+def encode_move(move):
+    (from_row, from_col), (to_row, to_col) = move
+    return (from_row * COLS + from_col) << 6 | (to_row * COLS + to_col)
+
+
+def decode_move(code):
+    from_sq, to_sq = code >> 6, code & 63
+    return divmod(from_sq, COLS), divmod(to_sq, COLS)
+
+
+class RecordError(ValueError):
+    pass
+
+
+class RecordWriter:
+    """逐局追加写入棋谱文件；文件为空时先写文件头"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.games = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_game(self, moves, result=None, metadata=None, start=None):
+        """写入一局：moves 为 ((行, 列), (行, 列)) 列表，result 为 'red'、'blue'、'draw' 或 None，
+        metadata 为可以转成JSON的字典，start 为非标准开局时的局面文本"""
+        if len(moves) > MAX_PLIES:
+            raise RecordError(f'步数超过上限：{len(moves)}')
+        if result not in RESULT_CODES:
+            raise RecordError(f'未知的对局结果：{result}')
+        meta = json.dumps(metadata, ensure_ascii=False, separators=(',', ':')).encode('utf-8') if metadata else b''
+        flags = 0
+        parts = []
+        if start is not None:
+            text = start.encode('ascii')
+            flags |= FLAG_START
+            parts.append(bytes((len(text),)) + text)
+        codes = array('H', [encode_move(move) for move in moves])
+        if sys.byteorder != 'little':
+            codes.byteswap()
+        self.file.write(GAME_HEADER.pack(RESULT_CODES[result], flags, len(meta), len(moves))
+                        + meta + b''.join(parts) + codes.tobytes())
+        self.games += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class GameRecord:
+    """一局棋谱；着法与附加信息在访问时才解码"""
+
+    __slots__ = ('offset', 'result', 'start', '_meta', '_codes')
+
+    def __init__(self, offset, result, start, meta, codes):
+        self.offset = offset
+        self.result = result
+        self.start = start
+        self._meta = meta
+        self._codes = codes
+
+    def __len__(self):
+        return len(self._codes) // 2
+
+    @property
+    def winner(self):
+        return self.result if self.result in ('red', 'blue') else None
+
+    @property
+    def metadata(self):
+        return json.loads(self._meta) if self._meta else {}
+
+    @property
+    def codes(self):
+        """每步着法的 2 字节编码（array('H')）"""
+        codes = array('H')
+        codes.frombytes(self._codes)
+        if sys.byteorder != 'little':
+            codes.byteswap()
+        return codes
+
+    @property
+    def moves(self):
+        return [decode_move(code) for code in self.codes]
+
+    def initial_state(self):
+        return GameState.from_text(self.start) if self.start else GameState()
+
+    def replay(self):
+        """依次生成每步之后的局面（同一个 GameState 对象原地更新）"""
+        state = self.initial_state()
+        for move in self.moves:
+            state.make_move(move)
+            yield state
+
+
+def read_games(path):
+    """逐局读取棋谱文件，返回 GameRecord 生成器"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < FILE_HEADER.size:
+                raise RecordError(f'{path} 不是棋谱文件')
+            magic, version = FILE_HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                raise RecordError(f'{path} 不是棋谱文件')
+            if version != VERSION:
+                raise RecordError(f'不支持的棋谱版本：{version}')
+            offset = FILE_HEADER.size
+            end = len(data)
+            while offset < end:
+                if offset + GAME_HEADER.size > end:
+                    raise RecordError(f'{path} 在偏移 {offset} 处被截断')
+                code, flags, meta_len, plies = GAME_HEADER.unpack_from(data, offset)
+                pos = offset + GAME_HEADER.size
+                meta = data[pos:pos + meta_len]
+                pos += meta_len
+                start = None
+                if flags & FLAG_START:
+                    if pos >= end:
+                        raise RecordError(f'{path} 在偏移 {offset} 处被截断')
+                    length = data[pos]
+                    start = data[pos + 1:pos + 1 + length].decode('ascii')
+                    pos += 1 + length
+                codes = data[pos:pos + 2 * plies]
+                pos += 2 * plies
+                if pos > end:
+                    raise RecordError(f'{path} 在偏移 {offset} 处被截断')
+                yield GameRecord(offset, RESULTS.get(code), start, meta, codes)
+                offset = pos
@@ -0,0 +1,231 @@
+"""棋谱批量复盘：流式读取 record.py 格式的棋谱，用规则引擎重放，输出局面、结果与着法统计
+
+整个流程由生成器串起来，任何时候只有一局棋在内存中，处理大型棋谱库时内存占用固定：
+    iter_files -> iter_games -> iter_positions -> 统计 / 写出局面
+多个文件时可以按文件分给多个进程，各进程的统计最后合并。
+
+用法示例：
+    python replay.py games.dsq
+    python replay.py archive/ --workers 8 --json
+    python replay.py games.dsq --positions positions.txt --every 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from engine import PieceType, PIECE_NAMES, is_den, opponent
+from record import SUFFIX, read_games
+
+
+def iter_files(paths):
+    """展开目录，生成其中所有棋谱文件（按文件名排序）"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(SUFFIX):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_games(paths):
+    for path in iter_files(paths):
+        yield from read_games(path)
+
+
+class IllegalMove(ValueError):
+    pass
+
+
+def iter_positions(records, every=1):
+    """逐步重放每局棋，生成 (棋谱, 步数, 局面, 着法, 被吃棋子, 走子的棋子)；局面是同一个 GameState 对象原地更新
+
+    局面为走子之前的局面，着法为这一步实际走的着法。every 大于1时每隔 every 步才生成一次，
+    但每一步都会被重放与检查。遇到不合法的着法抛出 IllegalMove。
+    """
+    for record in records:
+        state = record.initial_state()
+        for ply, move in enumerate(record.moves):
+            if not state.is_legal_move(move):
+                raise IllegalMove(f'偏移 {record.offset} 处的对局第 {ply + 1} 步不合法：{move}')
+            if ply % every == 0:
+                piece = state.get_piece(move[0])
+                to_row, to_col = move[1]
+                yield record, ply, state, move, state.board[to_row][to_col], piece
+            state.make_move(move)
+
+
+class ReplayStats:
+    """按棋子类型统计走子次数、吃子次数、被吃次数，以及进入兽穴的次数"""
+
+    def __init__(self):
+        self.games = 0
+        self.plies = 0
+        self.results = {'red': 0, 'blue': 0, 'draw': 0, 'unknown': 0}
+        self.illegal_games = 0
+        self.moves_by_type = {t: 0 for t in PieceType}
+        self.captures_by_type = {t: 0 for t in PieceType}
+        self.captured_by_type = {t: 0 for t in PieceType}
+        self.den_entries = 0
+
+    def add_game(self, record):
+        """重放一局并累加统计；着法不合法的对局只记入 illegal_games"""
+        moves = {t: 0 for t in PieceType}
+        captures = {t: 0 for t in PieceType}
+        captured = {t: 0 for t in PieceType}
+        den_entries = 0
+        plies = 0
+        try:
+            for _, _, state, move, target, piece in iter_positions((record,)):
+                moves[piece.type] += 1
+                if target is not None:
+                    captures[piece.type] += 1
+                    captured[target.type] += 1
+                if is_den(move[1][0], move[1][1], opponent(piece.player)):
+                    den_entries += 1
+                plies += 1
+        except IllegalMove:
+            self.illegal_games += 1
+            return
+        self.games += 1
+        self.plies += plies
+        self.results[record.result or 'unknown'] += 1
+        self.den_entries += den_entries
+        for t in PieceType:
+            self.moves_by_type[t] += moves[t]
+            self.captures_by_type[t] += captures[t]
+            self.captured_by_type[t] += captured[t]
+
+    def merge(self, other):
+        self.games += other.games
+        self.plies += other.plies
+        self.illegal_games += other.illegal_games
+        self.den_entries += other.den_entries
+        for key, value in other.results.items():
+            self.results[key] += value
+        for t in PieceType:
+            self.moves_by_type[t] += other.moves_by_type[t]
+            self.captures_by_type[t] += other.captures_by_type[t]
+            self.captured_by_type[t] += other.captured_by_type[t]
+        return self
+
+    def capture_rate(self, piece_type):
+        """该类棋子的着法中吃子的比例"""
+        moves = self.moves_by_type[piece_type]
+        return self.captures_by_type[piece_type] / moves if moves else 0.0
+
+    def to_dict(self):
+        return {
+            'games': self.games,
+            'plies': self.plies,
+            'results': dict(self.results),
+            'illegal_games': self.illegal_games,
+            'den_entries': self.den_entries,
+            'den_entry_rate': self.den_entries / self.games if self.games else 0.0,
+            'pieces': {
+                t.name: {
+                    'moves': self.moves_by_type[t],
+                    'captures': self.captures_by_type[t],
+                    'captured': self.captured_by_type[t],
+                    'capture_rate': self.capture_rate(t),
+                } for t in PieceType
+            },
+        }
+
+    def report(self):
+        games = self.games or 1
+        lines = [
+            f'对局数：{self.games}  总步数：{self.plies}  平均步数：{self.plies / games:.1f}  '
+            f'不合法棋谱：{self.illegal_games}',
+            f"红胜：{self.results['red']}  蓝胜：{self.results['blue']}  和棋：{self.results['draw']}  "
+            f"未知：{self.results['unknown']}",
+            f'进入兽穴：{self.den_entries}（每局 {self.den_entries / games:.2f} 次）',
+            '棋子  走子次数  吃子次数  吃子率  被吃次数',
+        ]
+        for t in PieceType:
+            lines.append(f'{PIECE_NAMES[t]}  {self.moves_by_type[t]:8d}  {self.captures_by_type[t]:8d}  '
+                         f'{self.capture_rate(t):6.2%}  {self.captured_by_type[t]:8d}')
+        return '\n'.join(lines)
+
+
+def collect_stats(records):
+    stats = ReplayStats()
+    for record in records:
+        stats.add_game(record)
+    return stats
+
+
+def _file_stats(path):
+    return collect_stats(read_games(path))
+
+
+def replay_stats(paths, workers=1):
+    """统计所有棋谱；workers 大于1时按文件分给多个进程"""
+    files = list(iter_files(paths))
+    if workers <= 1 or len(files) <= 1:
+        return collect_stats(iter_games(files))
+    stats = ReplayStats()
+    with multiprocessing.Pool(min(workers, len(files))) as pool:
+        for part in pool.imap_unordered(_file_stats, files):
+            stats.merge(part)
+    return stats
+
+
+def write_positions(paths, out, every=1):
+    """把局面逐行写出：局面文本、着法（起点行列与终点行列）、对局结果
+
+    与统计一样，含不合法着法的对局整局跳过。返回 (写出的局面数, 跳过的对局数)。
+    """
+    count = 0
+    skipped = 0
+    for record in iter_games(paths):
+        lines = []
+        try:
+            for _, _, state, move, _, _ in iter_positions((record,), every):
+                (from_row, from_col), (to_row, to_col) = move
+                lines.append(f'{state.to_text()}\t{from_row}{from_col}{to_row}{to_col}\t{record.result or "unknown"}\n')
+        except IllegalMove:
+            skipped += 1
+            continue
+        out.write(''.join(lines))
+        count += len(lines)
+    return count, skipped
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'应为正整数：{text}')
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋棋谱批量复盘与统计')
+    parser.add_argument('paths', nargs='+', help='棋谱文件或包含棋谱的目录')
+    parser.add_argument('--workers', type=int, default=1, help='按文件并行的进程数')
+    parser.add_argument('--positions', help='把局面写入该文件（- 表示标准输出），不做统计')
+    parser.add_argument('--every', type=positive_int, default=1, help='写出局面时每隔几步取一个')
+    parser.add_argument('--json', action='store_true', help='以JSON输出统计')
+    args = parser.parse_args()
+
+    if args.positions:
+        if args.positions == '-':
+            count, skipped = write_positions(args.paths, sys.stdout, args.every)
+        else:
+            with open(args.positions, 'w', encoding='utf-8') as out:
+                count, skipped = write_positions(args.paths, out, args.every)
+        print(f'局面数：{count}  跳过不合法的对局：{skipped}', file=sys.stderr)
+        return
+
+    stats = replay_stats(args.paths, args.workers)
+    if args.json:
+        print(json.dumps(stats.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print(stats.report())
+
+
+if __name__ == '__main__':
+    main()
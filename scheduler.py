@@ -0,0 +1,74 @@
+"""界面帧调度：空闲时阻塞等待事件，只有动画或拖动进行时才按固定帧率刷新"""
+import time
+from collections import deque
+
+import pygame
+
+# 帧耗时统计保留最近多少帧
+STATS_WINDOW = 600
+
+
+class FrameScheduler:
+    """每一帧开始时调用 wait(active) 取得事件，绘制完成后调用 end_frame()
+
+    active 为真时用 pygame.time.Clock 限制帧率；否则阻塞在 pygame.event.wait 上，
+    进程在没有输入时不占用CPU。idle_timeout_ms 大于0时空闲等待最多这么久就返回一帧。
+    """
+
+    def __init__(self, fps=60, idle_timeout_ms=0):
+        self.fps = fps
+        self.idle_timeout_ms = idle_timeout_ms
+        self.clock = pygame.time.Clock()
+        self.frame_times = deque(maxlen=STATS_WINDOW)
+        self.frames = 0
+        self.active_frames = 0
+        self.idle_wakeups = 0
+        self.idle_seconds = 0.0
+        self.started = time.perf_counter()
+        self.frame_start = self.started
+
+    def wait(self, active):
+        """返回本帧要处理的事件列表"""
+        if active:
+            self.clock.tick(self.fps)
+            self.active_frames += 1
+            events = pygame.event.get()
+        else:
+            start = time.perf_counter()
+            if self.idle_timeout_ms > 0:
+                event = pygame.event.wait(self.idle_timeout_ms)
+            else:
+                event = pygame.event.wait()
+            self.idle_seconds += time.perf_counter() - start
+            self.idle_wakeups += 1
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events.extend(pygame.event.get())
+            # 重置时钟，避免空闲后的第一帧动画被当成一次很长的帧
+            self.clock.tick()
+        self.frames += 1
+        self.frame_start = time.perf_counter()
+        return events
+
+    def end_frame(self):
+        # 记录本帧处理事件与绘制所用的时间（不含等待）
+        self.frame_times.append(time.perf_counter() - self.frame_start)
+
+    def stats(self):
+        times = sorted(self.frame_times)
+        elapsed = time.perf_counter() - self.started
+        count = len(times)
+        return {
+            'frames': self.frames,
+            'active_frames': self.active_frames,
+            'idle_wakeups': self.idle_wakeups,
+            'avg_ms': sum(times) / count * 1000 if count else 0.0,
+            'p95_ms': times[min(count - 1, int(count * 0.95))] * 1000 if count else 0.0,
+            'max_ms': times[-1] * 1000 if count else 0.0,
+            'idle_fraction': self.idle_seconds / elapsed if elapsed else 0.0,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"帧数：{s['frames']}（动画/拖动 {s['active_frames']}，空闲唤醒 {s['idle_wakeups']}）  "
+                f"帧耗时：平均 {s['avg_ms']:.2f}ms  P95 {s['p95_ms']:.2f}ms  最大 {s['max_ms']:.2f}ms  "
+                f"空闲等待占比 {s['idle_fraction']:.0%}")
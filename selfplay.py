@@ -0,0 +1,254 @@
+"""无界面批量自对弈：多进程并行对局，结果逐局写入磁盘
+
+用法示例：
+    python selfplay.py --games 1000 --workers 8 --red random --blue greedy --out games.dsq
+    python selfplay.py --games 200 --red alphabeta:depth=2 --blue mcts:playouts=200
+    python selfplay.py --games 200 --red greedy:book=opening.dsqb --blue alphabeta:depth=2,book=opening.dsqb
+    python selfplay.py --games 400 --workers 8 --scaling
+
+棋手写法为 名称[:参数=值,...]，可用的名称见 POLICIES。
+每局的随机种子由 --seed 与对局编号确定，同样的参数总能复现同样的对局
+（按时间限制搜索的 alphabeta:time=... 除外）。
+结果默认以 record.py 的二进制棋谱格式追加写入，--out-format jsonl 时每局写一行JSON。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from engine import GameState, is_den, opponent
+from ai import AlphaBetaSearcher, PIECE_VALUES
+from mcts import MCTSPlayer
+from record import RecordWriter
+from book import OpeningBook
+from tablebase import Tablebase
+
+# 超过该步数仍未分出胜负按和棋处理
+DEFAULT_MAX_PLIES = 300
+
+
+class RandomPolicy:
+    """随机走子"""
+
+    def choose(self, state, moves, rng):
+        return moves[rng.randrange(len(moves))]
+
+
+class GreedyPolicy:
+    """能进兽穴就进，否则吃掉价值最高的棋子，都没有则随机走子"""
+
+    def choose(self, state, moves, rng):
+        enemy = opponent(state.current_player)
+        best_value = 0
+        best = []
+        for move in moves:
+            to_row, to_col = move[1]
+            if is_den(to_row, to_col, enemy):
+                return move
+            target = state.board[to_row][to_col]
+            value = PIECE_VALUES[target.type] if target else 0
+            if value > best_value:
+                best_value = value
+                best = [move]
+            elif value == best_value and value:
+                best.append(move)
+        if best:
+            return best[rng.randrange(len(best))]
+        return moves[rng.randrange(len(moves))]
+
+
+class AlphaBetaPolicy:
+    """alpha-beta 搜索；给定 depth 时按固定深度搜索，结果可复现；tb 为残局库文件"""
+
+    def __init__(self, depth=None, time=None, tt=8, tb=None):
+        self.depth = int(depth) if depth else None
+        self.time_ms = int(time) if time else (10 ** 9 if self.depth else 200)
+        self.searcher = AlphaBetaSearcher(tt_size_mb=float(tt), tablebase=Tablebase(tb) if tb else None)
+
+    def choose(self, state, moves, rng):
+        return self.searcher.search(state, time_ms=self.time_ms, max_depth=self.depth).move
+
+
+class MCTSPolicy:
+    """单进程MCTS（自对弈本身已经按对局并行）"""
+
+    def __init__(self, playouts=200, c=1.4, selection='uct'):
+        self.playouts = int(playouts)
+        self.c = float(c)
+        self.selection = selection
+
+    def choose(self, state, moves, rng):
+        player = MCTSPlayer(playouts=self.playouts, workers=1, c=self.c, selection=self.selection,
+                            seed=rng.getrandbits(64), reuse_tree=False)
+        return player.choose_move(state)
+
+
+class BookPolicy:
+    """先查开局库，库中没有该局面时交给原来的棋手"""
+
+    def __init__(self, policy, path):
+        self.policy = policy
+        self.book = OpeningBook(path)
+
+    def choose(self, state, moves, rng):
+        return self.book.choose(state, rng) or self.policy.choose(state, moves, rng)
+
+
+POLICIES = {
+    'random': RandomPolicy,
+    'greedy': GreedyPolicy,
+    'alphabeta': AlphaBetaPolicy,
+    'mcts': MCTSPolicy,
+}
+
+
+def make_policy(spec):
+    """按 名称[:参数=值,...] 创建棋手；任何棋手都可以加 book=开局库文件"""
+    name, _, params = spec.partition(':')
+    if name not in POLICIES:
+        raise ValueError(f'未知的棋手：{name}')
+    kwargs = {}
+    for item in filter(None, params.split(',')):
+        key, _, value = item.partition('=')
+        kwargs[key] = value
+    book = kwargs.pop('book', None)
+    policy = POLICIES[name](**kwargs)
+    return BookPolicy(policy, book) if book else policy
+
+
+def game_seed(base_seed, index):
+    """对局的随机种子只取决于基础种子与对局编号，与分配到哪个进程无关"""
+    return random.Random(f'{base_seed}:{index}').getrandbits(64)
+
+
+def play_game(red, blue, seed, max_plies=DEFAULT_MAX_PLIES):
+    """下一局完整的棋，返回 (胜方或None, 着法列表)"""
+    rng = random.Random(seed)
+    state = GameState()
+    policies = {'red': red, 'blue': blue}
+    moves_played = []
+    while not state.winner and len(moves_played) < max_plies:
+        moves = state.legal_moves()
+        if not moves:
+            # 无子可动的一方判负
+            return opponent(state.current_player), moves_played
+        move = policies[state.current_player].choose(state, moves, rng)
+        state.make_move(move)
+        moves_played.append(move)
+    return state.winner, moves_played
+
+
+# 工作进程内的棋手实例（每个进程创建一次，搜索类棋手可以复用置换表）
+_worker_policies = None
+
+
+def _init_worker(red_spec, blue_spec):
+    global _worker_policies
+    _worker_policies = (make_policy(red_spec), make_policy(blue_spec))
+
+
+def _play_indexed(args):
+    index, base_seed, max_plies = args
+    seed = game_seed(base_seed, index)
+    red, blue = _worker_policies
+    winner, moves = play_game(red, blue, seed, max_plies)
+    return index, seed, winner, moves
+
+
+def run_selfplay(games, red_spec, blue_spec, workers=1, seed=0, max_plies=DEFAULT_MAX_PLIES,
+                 out=None, on_result=None, out_format='record'):
+    """并行下 games 局棋；每局结果产生时立即交给 on_result 或写入 out 文件，返回汇总统计"""
+    tasks = ((index, seed, max_plies) for index in range(games))
+    summary = {'games': 0, 'red': 0, 'blue': 0, 'draw': 0, 'plies': 0}
+    out_file = None
+    if out:
+        out_file = RecordWriter(out) if out_format == 'record' else open(out, 'a', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(red_spec, blue_spec))
+            results = pool.imap_unordered(_play_indexed, tasks, chunksize=max(1, min(16, games // (workers * 8))))
+        else:
+            pool = None
+            _init_worker(red_spec, blue_spec)
+            results = map(_play_indexed, tasks)
+        for index, game_seed_value, winner, moves in results:
+            summary['games'] += 1
+            summary[winner or 'draw'] += 1
+            summary['plies'] += len(moves)
+            if on_result:
+                on_result(index, game_seed_value, winner, moves)
+            if out_file and out_format == 'record':
+                metadata = {'game': index, 'seed': game_seed_value, 'red': red_spec, 'blue': blue_spec}
+                out_file.write_game(moves, winner or 'draw', metadata)
+            elif out_file:
+                record = {
+                    'game': index,
+                    'seed': game_seed_value,
+                    'red': red_spec,
+                    'blue': blue_spec,
+                    'winner': winner,
+                    'moves': [[fr, fc, tr, tc] for (fr, fc), (tr, tc) in moves],
+                }
+                out_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        if pool:
+            pool.close()
+            pool.join()
+    finally:
+        if out_file:
+            out_file.close()
+    elapsed = time.perf_counter() - start
+    summary['workers'] = workers
+    summary['elapsed'] = elapsed
+    summary['games_per_sec'] = summary['games'] / elapsed if elapsed else 0.0
+    summary['games_per_sec_per_core'] = summary['games_per_sec'] / workers
+    return summary
+
+
+def print_summary(summary):
+    games = summary['games'] or 1
+    print(f"对局数：{summary['games']}  进程数：{summary['workers']}  用时：{summary['elapsed']:.2f}秒")
+    print(f"红胜：{summary['red']}  蓝胜：{summary['blue']}  和棋：{summary['draw']}  "
+          f"平均步数：{summary['plies'] / games:.1f}")
+    print(f"每秒对局：{summary['games_per_sec']:.1f}  每核每秒对局：{summary['games_per_sec_per_core']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋批量自对弈')
+    parser.add_argument('--games', type=int, default=100, help='对局数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='进程数')
+    parser.add_argument('--red', default='random', help='红方棋手，如 random、greedy、alphabeta:depth=2、mcts:playouts=200')
+    parser.add_argument('--blue', default='random', help='蓝方棋手')
+    parser.add_argument('--seed', type=int, default=0, help='基础随机种子')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES, help='超过该步数判和')
+    parser.add_argument('--out', help='结果文件（逐局追加写入），如 games.dsq')
+    parser.add_argument('--out-format', choices=['record', 'jsonl'], default='record',
+                        help='结果文件格式：二进制棋谱或每局一行JSON')
+    parser.add_argument('--scaling', action='store_true', help='依次用 1、2、4…个进程运行，报告多核加速比')
+    args = parser.parse_args()
+
+    if args.scaling:
+        counts = []
+        n = 1
+        while n < args.workers:
+            counts.append(n)
+            n *= 2
+        counts.append(args.workers)
+        base = None
+        print('进程数  每秒对局  加速比  效率')
+        for workers in counts:
+            summary = run_selfplay(args.games, args.red, args.blue, workers, args.seed, args.max_plies)
+            base = base or summary['games_per_sec']
+            speedup = summary['games_per_sec'] / base
+            print(f'{workers:6d}  {summary["games_per_sec"]:8.1f}  {speedup:6.2f}  {speedup / workers:5.0%}')
+        return
+
+    summary = run_selfplay(args.games, args.red, args.blue, args.workers, args.seed,
+                           args.max_plies, args.out, out_format=args.out_format)
+    print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""联网对战服务器：asyncio 单进程同时托管大量无界面对局
+
+协议为按行分隔的JSON（UTF-8，每条消息一行），可以跑在TCP或Unix套接字上。
+
+客户端发给服务器：
+    {"type": "join"}                          排队，与下一个排队的玩家配对
+    {"type": "join", "room": "名称"}          进入指定房间，先到的执红、后到的执蓝
+    {"type": "move", "from": [行, 列], "to": [行, 列]}
+    {"type": "resign"}
+服务器发给客户端：
+    {"type": "waiting"}
+    {"type": "start", "game": 编号, "color": "red" 或 "blue"}
+    {"type": "state", "game": 编号, "ply": 步数, "position": 局面文本, "last": 上一步着法或null, "turn": 行棋方,
+     "finished": 这一步之后对局是否已结束}
+    {"type": "end", "game": 编号, "winner": 胜方或null, "reason": "move"、"no_moves"、"resign"、"disconnect"、"max_plies"}
+    {"type": "error", "message": 说明}
+
+局面文本为 GameState.to_text 的格式。着法由引擎的 can_move / can_capture 规则检查，
+每步之后把新局面推送给对局双方；无子可动的一方判负，超过步数上限判和。
+结束对局的那一步推送的局面带 "finished": true，随后是 end 消息，客户端不应再走子。
+
+用法示例：
+    python server.py --port 8765
+    python server.py --unix /tmp/dsq.sock
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+
+from engine import ROWS, COLS, GameState, opponent
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PLIES = 300
+# 单条消息的长度上限（字节）
+MAX_LINE = 4096
+# 监听队列长度：大量客户端同时连接时不被拒绝
+BACKLOG = 1024
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def parse_address(address):
+    """'主机:端口'、':端口' 或 'unix:路径' 转成 ('tcp', 主机, 端口) 或 ('unix', 路径)"""
+    if address.startswith('unix:'):
+        return 'unix', address[5:]
+    host, _, port = address.rpartition(':')
+    return 'tcp', host or '127.0.0.1', int(port)
+
+
+def _position(value):
+    row, col = value
+    if not (isinstance(row, int) and isinstance(col, int) and 0 <= row < ROWS and 0 <= col < COLS):
+        raise ValueError
+    return row, col
+
+
+class Player:
+    """一个客户端连接"""
+
+    __slots__ = ('writer', 'session', 'color')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.session = None
+        self.color = None
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+
+class Session:
+    """一局对局：服务器端的权威局面与双方连接"""
+
+    def __init__(self, game_id, red, blue, max_plies=DEFAULT_MAX_PLIES):
+        self.game_id = game_id
+        self.state = GameState()
+        self.players = {'red': red, 'blue': blue}
+        self.max_plies = max_plies
+        self.finished = False
+        for color, player in self.players.items():
+            player.session = self
+            player.color = color
+
+    def broadcast(self, message):
+        data = encode(message)
+        for player in self.players.values():
+            if not player.writer.is_closing():
+                player.writer.write(data)
+
+    def start(self):
+        for color, player in self.players.items():
+            player.send({'type': 'start', 'game': self.game_id, 'color': color})
+        self.broadcast_state(None)
+
+    def broadcast_state(self, last, finished=False):
+        self.broadcast({
+            'type': 'state',
+            'game': self.game_id,
+            'ply': len(self.state.history),
+            'position': self.state.to_text(),
+            'last': last,
+            'turn': self.state.current_player,
+            'finished': finished,
+        })
+
+    def play(self, player, move):
+        """执行玩家的着法，不合法时返回错误说明"""
+        state = self.state
+        if player.color != state.current_player:
+            return '还没有轮到你'
+        if not state.is_legal_move(move):
+            return f'不合法的着法：{move}'
+        state.make_move(move)
+        # 先判定这一步是否结束对局，推送的局面里标明，免得输的一方以为轮到自己走
+        result = None
+        if state.winner:
+            result = (state.winner, 'move')
+        elif not state.legal_moves():
+            # 无子可动的一方判负
+            result = (player.color, 'no_moves')
+        elif len(state.history) >= self.max_plies:
+            result = (None, 'max_plies')
+        self.broadcast_state([list(move[0]), list(move[1])], result is not None)
+        if result:
+            self.finish(*result)
+        return None
+
+    def finish(self, winner, reason):
+        if self.finished:
+            return
+        self.finished = True
+        self.broadcast({'type': 'end', 'game': self.game_id, 'winner': winner, 'reason': reason})
+        for player in self.players.values():
+            player.session = None
+            player.color = None
+
+
+class GameServer:
+    """管理连接、配对与全部进行中的对局"""
+
+    def __init__(self, max_plies=DEFAULT_MAX_PLIES):
+        self.max_plies = max_plies
+        self.sessions = {}
+        self.waiting = None
+        self.rooms = {}
+        self.game_ids = itertools.count(1)
+        self.connections = 0
+        self.moves = 0
+        self.games_finished = 0
+
+    async def serve_tcp(self, host='127.0.0.1', port=DEFAULT_PORT):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE, backlog=BACKLOG)
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self.handle, path, limit=MAX_LINE, backlog=BACKLOG)
+
+    async def serve(self, address):
+        kind, *args = parse_address(address)
+        if kind == 'unix':
+            return await self.serve_unix(*args)
+        return await self.serve_tcp(*args)
+
+    async def handle(self, reader, writer):
+        player = Player(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    player.send({'type': 'error', 'message': '消息过长'})
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                self.dispatch(player, line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.leave(player)
+            writer.close()
+
+    def dispatch(self, player, line):
+        try:
+            message = json.loads(line)
+            kind = message['type']
+        except (ValueError, KeyError, TypeError):
+            player.send({'type': 'error', 'message': '无法解析的消息'})
+            return
+        if kind == 'join':
+            room = message.get('room')
+            if room is not None and not isinstance(room, str):
+                player.send({'type': 'error', 'message': '房间名应为字符串'})
+                return
+            self.join(player, room)
+        elif kind == 'move':
+            session = player.session
+            if session is None:
+                player.send({'type': 'error', 'message': '不在对局中'})
+                return
+            try:
+                move = (_position(message['from']), _position(message['to']))
+            except (KeyError, TypeError, ValueError):
+                player.send({'type': 'error', 'message': '无法解析的着法'})
+                return
+            error = session.play(player, move)
+            if error:
+                player.send({'type': 'error', 'message': error})
+                return
+            self.moves += 1
+            if session.finished:
+                self.end(session)
+        elif kind == 'resign':
+            session = player.session
+            if session is not None:
+                session.finish(opponent(player.color), 'resign')
+                self.end(session)
+        else:
+            player.send({'type': 'error', 'message': f'未知的消息类型：{kind}'})
+
+    def join(self, player, room=None):
+        if player.session is not None or player is self.waiting or player in self.rooms.values():
+            player.send({'type': 'error', 'message': '已经在对局或排队中'})
+            return
+        if room is None:
+            partner, self.waiting = self.waiting, None
+            if partner is None:
+                self.waiting = player
+        else:
+            partner = self.rooms.pop(room, None)
+            if partner is None:
+                self.rooms[room] = player
+        if partner is None:
+            player.send({'type': 'waiting'})
+            return
+        session = Session(next(self.game_ids), partner, player, self.max_plies)
+        self.sessions[session.game_id] = session
+        session.start()
+
+    def leave(self, player):
+        # 断线：取消排队；对局中断线判对方胜
+        if self.waiting is player:
+            self.waiting = None
+        for room, waiting in list(self.rooms.items()):
+            if waiting is player:
+                del self.rooms[room]
+        session = player.session
+        if session is not None:
+            session.finish(opponent(player.color), 'disconnect')
+            self.end(session)
+
+    def end(self, session):
+        if self.sessions.pop(session.game_id, None) is not None:
+            self.games_finished += 1
+
+    def stats(self):
+        return {
+            'connections': self.connections,
+            'games': len(self.sessions),
+            'games_finished': self.games_finished,
+            'moves': self.moves,
+        }
+
+
+async def run_server(address, max_plies=DEFAULT_MAX_PLIES, report_interval=0):
+    game_server = GameServer(max_plies)
+    server = await game_server.serve(address)
+    print(f'服务器已启动：{address}')
+    async with server:
+        if report_interval:
+            while True:
+                await asyncio.sleep(report_interval)
+                print(json.dumps(game_server.stats()))
+        else:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋联网对战服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--unix', help='改为监听该Unix套接字路径')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES, help='超过该步数判和')
+    parser.add_argument('--report', type=float, default=0, help='每隔这么多秒打印一次统计')
+    args = parser.parse_args()
+
+    address = f'unix:{args.unix}' if args.unix else f'{args.host}:{args.port}'
+    try:
+        asyncio.run(run_server(address, args.max_plies, args.report))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,462 @@
+"""残局库：用逆向分析求解棋子数不超过 K 的全部局面，结果存成可以用 mmap 直接查询的文件
+
+子力组合（签名）写成 红方字母 + 'v' + 蓝方字母，字母按等级从高到低排列，例如 'ERvl'
+表示红方象、鼠对蓝方狮。每个签名一张表，表项下标为
+    ((第1个棋子的格号 * 63 + 第2个棋子的格号) * 63 + ...) * 2 + 行棋方（0红1蓝）
+棋子按红方在前、各方按等级从高到低的顺序排列。每个表项 2 字节：距离 << 2 | 结果，
+结果为 DRAW/WIN/LOSS（以行棋方为准）或 INVALID（两子重叠、棋子在兽穴上等不可能出现的局面）。
+距离按步数计：WIN 1 表示这一步就能获胜，LOSS 0 表示无子可动（判负），
+LOSS n 表示对方最晚在第 n 步获胜。
+
+着法全部由 bitboard.BitBoard.legal_moves 生成，吃子关系来自 Piece.can_capture，
+河流、跳河、陷阱、兽穴与鼠吃象的规则与引擎完全一致。逆向传播所需的前驱关系在正向生成
+着法时一并记录，因此不需要另写一套"倒着走"的规则。
+
+用法示例：
+    python tablebase.py --pieces 3 --workers 4 --out endgame.dsqt
+    python tablebase.py --signature ERvl --out endgame.dsqt
+    python tablebase.py --probe '7/7/3l3/7/7/7/3E3/6R/7 r' --tb endgame.dsqt
+"""
+import argparse
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from engine import PieceType, PIECE_LETTERS, LETTER_PIECES, GameState
+from bitboard import BitBoard, SQUARES, DEN, RED, BLUE
+
+DRAW = 0
+WIN = 1
+LOSS = 2
+INVALID = 3
+RESULT_NAMES = {DRAW: 'draw', WIN: 'win', LOSS: 'loss'}
+MAX_DISTANCE = (1 << 14) - 1
+
+MAGIC = b'DSQT'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3xI')
+INDEX_ENTRY = struct.Struct('<20sQQ')
+ENTRY = struct.Struct('<H')
+
+# 签名里棋子的顺序：等级从高到低
+TYPE_ORDER = sorted(PieceType, key=lambda t: t.value, reverse=True)
+_LETTERS = ({t: PIECE_LETTERS[t] for t in PieceType}, {t: PIECE_LETTERS[t].lower() for t in PieceType})
+
+# 兽穴上不会有棋子：进入己方兽穴不合法，进入对方兽穴则对局已经结束
+_DENS = {sq for sq in range(SQUARES) if (DEN[RED] | DEN[BLUE]) >> sq & 1}
+
+
+def make_signature(red_types, blue_types):
+    red = sorted(red_types, key=lambda t: t.value, reverse=True)
+    blue = sorted(blue_types, key=lambda t: t.value, reverse=True)
+    return ''.join(_LETTERS[RED][t] for t in red) + 'v' + ''.join(_LETTERS[BLUE][t] for t in blue)
+
+
+def parse_signature(signature):
+    """返回 [(方, 类型值), ...]，顺序即表项下标中棋子的顺序"""
+    red, sep, blue = signature.partition('v')
+    if not sep or not red or not blue or not red.isupper() or not blue.islower():
+        raise ValueError(f'无法解析的签名：{signature}')
+    pieces = []
+    for side, letters in ((RED, red), (BLUE, blue.upper())):
+        types = [LETTER_PIECES[ch] for ch in letters]
+        if len(set(types)) != len(types):
+            raise ValueError(f'同一方不能有两个相同的棋子：{signature}')
+        if make_signature(types, ())[:-1] != letters:
+            raise ValueError(f'签名中的棋子应按等级从高到低排列：{signature}')
+        pieces.extend((side, t.value) for t in types)
+    return pieces
+
+
+def _signature_from_pieces(pieces):
+    red = [PieceType(t) for side, t in pieces if side == RED]
+    blue = [PieceType(t) for side, t in pieces if side == BLUE]
+    return make_signature(red, blue)
+
+
+def all_signatures(max_pieces):
+    """双方都至少有一个棋子、总数不超过 max_pieces 的所有签名"""
+    result = []
+    for total in range(2, max_pieces + 1):
+        for red_count in range(1, total):
+            for red in itertools.combinations(TYPE_ORDER, red_count):
+                for blue in itertools.combinations(TYPE_ORDER, total - red_count):
+                    result.append(make_signature(red, blue))
+    return result
+
+
+def sub_signatures(signature):
+    """吃掉一个棋子后可能到达、且双方仍都有棋子的签名"""
+    pieces = parse_signature(signature)
+    result = set()
+    for j in range(len(pieces)):
+        rest = pieces[:j] + pieces[j + 1:]
+        if any(side == RED for side, _ in rest) and any(side == BLUE for side, _ in rest):
+            result.add(_signature_from_pieces(rest))
+    return sorted(result)
+
+
+def with_dependencies(signatures):
+    """补齐求解所需的全部较小签名，按棋子数从少到多排列"""
+    needed = set()
+    stack = list(signatures)
+    while stack:
+        signature = stack.pop()
+        if signature not in needed:
+            needed.add(signature)
+            stack.extend(sub_signatures(signature))
+    return sorted(needed, key=lambda s: (len(s), s))
+
+
+def solve(signature, subtables):
+    """求解一个签名，返回 array('H') 表；subtables 为 {签名: 表} 或可按下标取值的对象"""
+    pieces = parse_signature(signature)
+    k = len(pieces)
+    size = SQUARES ** k * 2
+    weights = [SQUARES ** (k - 1 - i) * 2 for i in range(k)]
+    sides = [side for side, _ in pieces]
+    types = [t for _, t in pieces]
+    counts = [sides.count(RED), sides.count(BLUE)]
+
+    # 吃掉第 j 个棋子后到达的子表及其下标权重
+    captures = []
+    for j in range(k):
+        rest = pieces[:j] + pieces[j + 1:]
+        if counts[sides[j]] == 1:
+            captures.append(None)
+        else:
+            sub_weights = [SQUARES ** (k - 2 - i) * 2 for i in range(k - 1)]
+            captures.append((subtables[_signature_from_pieces(rest)], sub_weights))
+
+    values = array('H', [INVALID]) * size
+    remaining = array('i', [0]) * size
+    worst = array('H', [0]) * size
+    # 不可能判负的局面（有和棋或必胜的后续）
+    no_loss = bytearray(size)
+    children = array('i')
+    parents = array('i')
+    buckets = {}
+
+    def push(distance, index, result):
+        buckets.setdefault(distance, []).append((index, result))
+
+    free = [sq for sq in range(SQUARES) if sq not in _DENS]
+    for squares in itertools.product(free, repeat=k):
+        if len(set(squares)) < k:
+            continue
+        base = 0
+        for sq, w in zip(squares, weights):
+            base += sq * w
+        at = {sq: i for i, sq in enumerate(squares)}
+        bb = BitBoard()
+        for sq, side, t in zip(squares, sides, types):
+            bb.pieces[side][t] |= 1 << sq
+            bb.occ[side] |= 1 << sq
+        for side in (RED, BLUE):
+            index = base + side
+            values[index] = DRAW
+            bb.side = side
+            moves = bb.legal_moves()
+            if not moves:
+                push(0, index, LOSS)
+                continue
+            den = DEN[1 - side]
+            best_win = None
+            ext_worst = -1
+            for frm, to in moves:
+                if den >> to & 1:
+                    best_win = 1
+                    break
+                i = at[frm]
+                j = at.get(to)
+                if j is None:
+                    children.append(index + (to - frm) * weights[i] + 1 - 2 * side)
+                    parents.append(index)
+                    remaining[index] += 1
+                    continue
+                capture = captures[j]
+                if capture is None:
+                    # 吃掉对方最后一个棋子
+                    best_win = 1
+                    break
+                table, sub_weights = capture
+                child = 1 - side
+                n = 0
+                for m, sq in enumerate(squares):
+                    if m == j:
+                        continue
+                    child += (to if m == i else sq) * sub_weights[n]
+                    n += 1
+                code = table[child]
+                result, distance = code & 3, code >> 2
+                if result == LOSS:
+                    if best_win is None or distance + 1 < best_win:
+                        best_win = distance + 1
+                elif result == WIN:
+                    ext_worst = max(ext_worst, distance)
+                else:
+                    no_loss[index] = 1
+            if best_win is not None:
+                no_loss[index] = 1
+                push(best_win, index, WIN)
+            elif not remaining[index] and not no_loss[index]:
+                push(ext_worst + 1, index, LOSS)
+            else:
+                worst[index] = max(ext_worst, 0)
+
+    # 反向邻接表（CSR）：每个局面的前驱
+    offsets = array('i', [0]) * (size + 1)
+    for child in children:
+        offsets[child + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    fill = array('i', offsets)
+    predecessors = array('i', [0]) * len(children)
+    for child, parent in zip(children, parents):
+        predecessors[fill[child]] = parent
+        fill[child] += 1
+    del children, parents, fill
+
+    # 按距离从小到大处理：距离 d 的负局使前驱在 d+1 步获胜；
+    # 一个局面的后续全部是对方胜局时，它在最长的那条路线上落败
+    resolved = bytearray(size)
+    distance = 0
+    while buckets:
+        items = buckets.pop(distance, ())
+        for index, result in items:
+            if resolved[index]:
+                continue
+            resolved[index] = 1
+            if distance > MAX_DISTANCE:
+                raise OverflowError(f'{signature} 的距离超过上限')
+            values[index] = distance << 2 | result
+            for p in range(offsets[index], offsets[index + 1]):
+                parent = predecessors[p]
+                if resolved[parent]:
+                    continue
+                if result == LOSS:
+                    no_loss[parent] = 1
+                    push(distance + 1, parent, WIN)
+                else:
+                    remaining[parent] -= 1
+                    if distance > worst[parent]:
+                        worst[parent] = distance
+                    if not remaining[parent] and not no_loss[parent]:
+                        push(worst[parent] + 1, parent, LOSS)
+        distance += 1
+    return values
+
+
+def _table_path(directory, signature):
+    return os.path.join(directory, signature + '.tbl')
+
+
+def _load_table(path):
+    table = array('H')
+    with open(path, 'rb') as f:
+        table.frombytes(f.read())
+    if sys.byteorder != 'little':
+        table.byteswap()
+    return table
+
+
+class _SubtableCache(dict):
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def __missing__(self, signature):
+        table = _load_table(_table_path(self.directory, signature))
+        self[signature] = table
+        return table
+
+
+_worker_cache = None
+
+
+def _solve_to_file(args):
+    global _worker_cache
+    signature, directory = args
+    if _worker_cache is None or _worker_cache.directory != directory:
+        _worker_cache = _SubtableCache(directory)
+    start = time.perf_counter()
+    table = solve(signature, _worker_cache)
+    counts = [0, 0, 0]
+    for code in table:
+        if code & 3 != INVALID:
+            counts[code & 3] += 1
+    if sys.byteorder != 'little':
+        table.byteswap()
+    with open(_table_path(directory, signature), 'wb') as f:
+        table.tofile(f)
+    return signature, counts, time.perf_counter() - start
+
+
+def generate(signatures, out, workers=1, progress=None):
+    """求解 signatures（自动补齐依赖）并写入 out；同样棋子数的签名分给多个进程并行求解"""
+    signatures = with_dependencies(signatures)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out))) as directory:
+        levels = {}
+        for signature in signatures:
+            levels.setdefault(len(parse_signature(signature)), []).append(signature)
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            for k in sorted(levels):
+                tasks = [(signature, directory) for signature in levels[k]]
+                results = pool.imap_unordered(_solve_to_file, tasks) if pool else map(_solve_to_file, tasks)
+                for signature, counts, elapsed in results:
+                    if progress:
+                        progress(signature, counts, elapsed)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        _write_file(out, directory, signatures)
+    return signatures
+
+
+def _write_file(out, directory, signatures):
+    header_size = FILE_HEADER.size + INDEX_ENTRY.size * len(signatures)
+    offset = header_size
+    index = []
+    for signature in signatures:
+        entries = SQUARES ** len(parse_signature(signature)) * 2
+        index.append(INDEX_ENTRY.pack(signature.encode('ascii'), offset, entries))
+        offset += entries * ENTRY.size
+    with open(out, 'wb') as f:
+        f.write(FILE_HEADER.pack(MAGIC, VERSION, len(signatures)))
+        f.write(b''.join(index))
+        for signature in signatures:
+            with open(_table_path(directory, signature), 'rb') as table:
+                f.write(table.read())
+
+
+class Tablebase:
+    """只读的残局库；表项通过 mmap 直接读取，不会整个载入内存"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} 不是残局库文件')
+        if version != VERSION:
+            raise ValueError(f'不支持的残局库版本：{version}')
+        self.tables = {}
+        for i in range(count):
+            name, offset, _ = INDEX_ENTRY.unpack_from(self.data, FILE_HEADER.size + i * INDEX_ENTRY.size)
+            self.tables[name.rstrip(b'\0').decode('ascii')] = offset
+        self.max_pieces = max((len(parse_signature(s)) for s in self.tables), default=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def probe_code(self, state):
+        """返回局面的原始表项，局面不在库中时返回None"""
+        red = state.piece_lists['red']
+        blue = state.piece_lists['blue']
+        if not red or not blue or len(red) + len(blue) > self.max_pieces:
+            return None
+        if len(red) > 1:
+            red = sorted(red, key=_rank)
+        if len(blue) > 1:
+            blue = sorted(blue, key=_rank)
+        letters = _LETTERS
+        signature = (''.join([letters[RED][p.type] for p in red]) + 'v'
+                     + ''.join([letters[BLUE][p.type] for p in blue]))
+        offset = self.tables.get(signature)
+        if offset is None:
+            return None
+        index = 0
+        for piece in red + blue:
+            row, col = piece.pos
+            index = index * SQUARES + row * 7 + col
+        index = index * 2 + (state.current_player == 'blue')
+        return ENTRY.unpack_from(self.data, offset + index * ENTRY.size)[0]
+
+    def probe(self, state):
+        """返回 (结果, 距离)，结果为 'win'、'loss' 或 'draw'（以行棋方为准）；不在库中返回None"""
+        code = self.probe_code(state)
+        if code is None or code & 3 == INVALID:
+            return None
+        return RESULT_NAMES[code & 3], code >> 2
+
+    def best_move(self, state):
+        """按残局库选出最快获胜、最晚落败的着法；局面不在库中时返回None"""
+        if self.probe(state) is None:
+            return None
+        best = None
+        best_key = None
+        for move in state.legal_moves():
+            token = state.make_move(move)
+            try:
+                if state.winner:
+                    return move
+                code = self.probe_code(state)
+            finally:
+                state.unmake_move(token)
+            result, distance = code & 3, code >> 2
+            # 对手的负局就是我方的胜局：胜局距离越短越好，负局距离越长越好
+            if result == LOSS:
+                key = (2, -distance)
+            elif result == DRAW:
+                key = (1, 0)
+            else:
+                key = (0, distance)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = move
+        return best
+
+
+def _rank(piece):
+    return -piece.type.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='斗兽棋残局库生成与查询')
+    parser.add_argument('--pieces', type=int, help='求解所有不超过该棋子数的签名')
+    parser.add_argument('--signature', action='append', default=[], help='只求解指定签名（及其依赖），可重复')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行进程数')
+    parser.add_argument('--out', default='endgame.dsqt', help='输出文件')
+    parser.add_argument('--tb', help='查询时使用的残局库文件')
+    parser.add_argument('--probe', help='查询一个局面（GameState.to_text 格式）')
+    args = parser.parse_args()
+
+    if args.probe:
+        with Tablebase(args.tb or args.out) as tb:
+            state = GameState.from_text(args.probe)
+            print(tb.probe(state), tb.best_move(state))
+        return
+
+    signatures = list(args.signature)
+    if args.pieces:
+        signatures += all_signatures(args.pieces)
+    if not signatures:
+        parser.error('需要 --pieces 或 --signature')
+
+    def progress(signature, counts, elapsed):
+        print(f'{signature:10s} 胜{counts[WIN]:9d}  负{counts[LOSS]:9d}  和{counts[DRAW]:9d}  {elapsed:7.2f}秒')
+
+    start = time.perf_counter()
+    solved = generate(signatures, args.out, args.workers, progress)
+    print(f'共 {len(solved)} 个签名，用时 {time.perf_counter() - start:.1f}秒，写入 {args.out}'
+          f'（{os.path.getsize(args.out) / 1024 / 1024:.1f} MB）')
+
+
+if __name__ == '__main__':
+    main()
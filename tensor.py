@@ -0,0 +1,321 @@
+"""批量局面的 NumPy 张量表示与向量化计算
+
+N 个局面编码为形状 (N, PLANES, 9, 7) 的数组，各平面为：
+    0-7    红方棋子，按类型值排列（鼠=0 ... 象=7）
+    8-15   蓝方棋子
+    16     河流
+    17-18  红方、蓝方陷阱
+    19-20  红方、蓝方兽穴
+    21     行棋方（蓝方行棋时全为1）
+所有计算都对整批局面一次完成，不逐个访问 Piece 对象。
+
+numpy 只是这个模块的依赖，游戏本身不需要它：pip install numpy==2.4.6
+"""
+try:
+    import numpy as np
+except ImportError as exc:
+    raise ImportError('tensor.py 需要 numpy，请先 pip install numpy==2.4.6') from exc
+
+from engine import ROWS, COLS, PieceType
+from bitboard import (BitBoard, SQUARES, FULL, RIVER, LAND, DEN, TRAP, NOT_COL0, NOT_COL6, EATS, JUMPS,
+                      RED, BLUE, SIDES, RAT, LION, TIGER, square)
+from ai import PIECE_VALUES, ADVANCE_BONUS, DEN_POS
+
+TYPES = 8
+PIECE_PLANES = 2 * TYPES
+PLANE_RIVER = 16
+PLANE_TRAP = (17, 18)
+PLANE_DEN = (19, 20)
+PLANE_SIDE = 21
+PLANES = 22
+
+# 着法平面：按起点格标记，前4个为走一步的方向，后4个为狮虎跳河的方向
+MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT = 0, 1, 2, 3
+JUMP_UP, JUMP_DOWN, JUMP_LEFT, JUMP_RIGHT = 4, 5, 6, 7
+MOVE_PLANES = 8
+
+# 计算时把每个平面压缩成一个 uint64 位掩码（与 bitboard.py 的格子编号相同），
+# 这样每一步运算都是对 N 个整数的一次向量操作
+_U = np.uint64
+_ONE = _U(1)
+
+
+def _planes(masks):
+    # (..., K) 的 uint64 掩码展开为 (..., K, 9, 7) 的 0/1 平面
+    shape = masks.shape
+    raw = np.ascontiguousarray(masks, dtype='<u8').view(np.uint8).reshape(shape + (8,))
+    bits = np.unpackbits(raw, axis=-1, count=SQUARES, bitorder='little')
+    return bits.reshape(shape + (ROWS, COLS))
+
+
+def _masks(planes):
+    # (..., K, 9, 7) 的 0/1 平面压缩为 (..., K) 的 uint64 掩码：
+    # 每个平面补成64格后，整个样本一次 packbits，正好每8字节一个平面
+    shape = planes.shape[:-3]
+    k = planes.shape[-3]
+    padded = np.zeros((int(np.prod(shape)), k, 64), dtype=np.uint8)
+    padded[:, :, :SQUARES] = planes.reshape(-1, k, SQUARES)
+    packed = np.packbits(padded.reshape(len(padded), -1), axis=1, bitorder='little')
+    return packed.view('<u8').astype(_U).reshape(shape + (k,))
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(masks):
+        return np.bitwise_count(masks).astype(np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+    def _popcount(masks):
+        raw = np.ascontiguousarray(masks, dtype='<u8').view(np.uint8).reshape(masks.shape + (8,))
+        return _BYTE_COUNTS[raw].sum(axis=-1)
+
+
+RIVER_PLANE = _planes(np.array(RIVER, dtype=_U)).astype(bool)
+TRAP_PLANES = _planes(np.array(TRAP, dtype=_U)).astype(bool)
+DEN_PLANES = _planes(np.array(DEN, dtype=_U)).astype(bool)
+
+_TRAP = np.array(TRAP, dtype=_U)
+_DEN = np.array(DEN, dtype=_U)
+_NOT_COL0 = _U(NOT_COL0)
+_NOT_COL6 = _U(NOT_COL6)
+_LAND = _U(LAND)
+_FULL = _U(FULL)
+_SHIFT_ROW = _U(COLS)
+
+
+def _rings(side):
+    # RINGS[side][d]：到对方兽穴曼哈顿距离恰好为 d 的格子
+    den_row, den_col = DEN_POS[SIDES[1 - side]]
+    rings = [0] * (ROWS + COLS - 1)
+    for row in range(ROWS):
+        for col in range(COLS):
+            rings[abs(row - den_row) + abs(col - den_col)] |= 1 << square(row, col)
+    return rings
+
+
+RINGS = (_rings(RED), _rings(BLUE))
+MAX_DISTANCE = ROWS + COLS - 2
+
+VALUE_VECTOR = np.array([PIECE_VALUES[PieceType(t)] for t in range(1, TYPES + 1)], dtype=np.int64)
+
+# 跳河着法：(着法平面, 起点格, 终点格, 途经河流掩码)
+JUMP_MOVES = []
+for _frm in range(SQUARES):
+    for _to, _path in JUMPS[_frm]:
+        _delta = _to - _frm
+        if abs(_delta) >= COLS:
+            _plane = JUMP_UP if _delta < 0 else JUMP_DOWN
+        else:
+            _plane = JUMP_LEFT if _delta < 0 else JUMP_RIGHT
+        JUMP_MOVES.append((_plane, _frm, _to, _path))
+
+
+def _jump_shifts():
+    # 同一方向的跳河着法位移相同、途经的河流格相对起点的位移也相同，
+    # 因此可以像走一步那样对整个掩码移位：(着法平面, 起点掩码, 位移, 途经格位移)
+    shifts = []
+    for plane in (JUMP_UP, JUMP_DOWN, JUMP_LEFT, JUMP_RIGHT):
+        entries = [(frm, to, path) for p, frm, to, path in JUMP_MOVES if p == plane]
+        sources = 0
+        forms = set()
+        for frm, to, path in entries:
+            sources |= 1 << frm
+            forms.add((to - frm, tuple(sq - frm for sq in range(SQUARES) if path >> sq & 1)))
+        assert len(forms) == 1, '跳河表不是按方向统一的形状'
+        delta, offsets = forms.pop()
+        shifts.append((plane, _U(sources), delta, offsets))
+    return shifts
+
+
+JUMP_SHIFTS = _jump_shifts()
+
+
+def _shift(masks, offset):
+    # 把 sq + offset 处的位移到 sq 处
+    return masks >> _U(offset) if offset > 0 else masks << _U(-offset)
+
+
+def _empty(n, dtype):
+    tensor = np.zeros((n, PLANES, ROWS, COLS), dtype=dtype)
+    tensor[:, PLANE_RIVER] = RIVER_PLANE
+    tensor[:, PLANE_TRAP[RED]] = TRAP_PLANES[RED]
+    tensor[:, PLANE_TRAP[BLUE]] = TRAP_PLANES[BLUE]
+    tensor[:, PLANE_DEN[RED]] = DEN_PLANES[RED]
+    tensor[:, PLANE_DEN[BLUE]] = DEN_PLANES[BLUE]
+    return tensor
+
+
+def encode_bitboards(boards, dtype=np.uint8):
+    """把 BitBoard 列表编码为 (N, PLANES, 9, 7) 数组"""
+    masks = np.array([bb.pieces[RED][1:] + bb.pieces[BLUE][1:] for bb in boards],
+                     dtype=_U).reshape(-1, PIECE_PLANES)
+    tensor = _empty(len(masks), dtype)
+    tensor[:, :PIECE_PLANES] = _planes(masks)
+    tensor[:, PLANE_SIDE] = np.array([bb.side for bb in boards], dtype=dtype)[:, None, None]
+    return tensor
+
+
+def encode_states(states, dtype=np.uint8):
+    """把 GameState 列表编码为 (N, PLANES, 9, 7) 数组"""
+    tensor = _empty(len(states), dtype)
+    for i, state in enumerate(states):
+        for side, player in enumerate(SIDES):
+            for piece in state.piece_lists[player]:
+                row, col = piece.pos
+                tensor[i, side * TYPES + piece.type.value - 1, row, col] = 1
+        if state.current_player == 'blue':
+            tensor[i, PLANE_SIDE] = 1
+    return tensor
+
+
+def piece_masks(tensor):
+    """各方各类型棋子的位掩码，形状 (N, 2, 8)，格子编号同 bitboard.py"""
+    return _masks(tensor[:, :PIECE_PLANES]).reshape(-1, 2, TYPES)
+
+
+def decode_bitboards(tensor):
+    """encode_bitboards 的逆变换（胜负信息不在张量中，按局面重新判断）"""
+    masks = piece_masks(tensor)
+    sides = tensor[:, PLANE_SIDE, 0, 0]
+    boards = []
+    for (red, blue), side in zip(masks.tolist(), sides.tolist()):
+        bb = BitBoard()
+        bb.pieces = [[0] + red, [0] + blue]
+        bb.occ = [sum(red), sum(blue)]
+        bb.side = int(side)
+        for s in (RED, BLUE):
+            if bb.occ[s] & DEN[1 - s] or not bb.occ[1 - s]:
+                bb.winner = s
+        boards.append(bb)
+    return boards
+
+
+def decode_states(tensor):
+    """encode_states 的逆变换"""
+    return [bb.to_state() for bb in decode_bitboards(tensor)]
+
+
+def _occupancy(masks):
+    # (N, 2, 8) -> (N, 2)
+    return np.bitwise_or.reduce(masks, axis=2)
+
+
+def material_counts(tensor):
+    """各方各类型棋子的数量，形状 (N, 2, 8)"""
+    return _popcount(piece_masks(tensor))
+
+
+def material(tensor, values=VALUE_VECTOR):
+    """各方子力总价值，形状 (N, 2)"""
+    return material_counts(tensor) @ values
+
+
+def trap_occupancy(tensor):
+    """各方落在对方陷阱里（战斗力为0）的棋子数，形状 (N, 2)"""
+    occ = _occupancy(piece_masks(tensor))
+    return _popcount(occ & _TRAP[::-1])
+
+
+def _distance_sums(occ, side):
+    # 该方所有棋子到对方兽穴的距离之和
+    total = np.zeros(len(occ), dtype=np.int64)
+    for distance, ring in enumerate(RINGS[side]):
+        if distance:
+            total += distance * _popcount(occ & _U(ring))
+    return total
+
+
+def den_distance(tensor):
+    """各方离对方兽穴最近的棋子的曼哈顿距离，形状 (N, 2)；没有棋子的一方为 ROWS + COLS"""
+    occ = _occupancy(piece_masks(tensor))
+    result = np.full(occ.shape, ROWS + COLS, dtype=np.int64)
+    for side in (RED, BLUE):
+        column = result[:, side]
+        for distance in range(MAX_DISTANCE, -1, -1):
+            hit = (occ[:, side] & _U(RINGS[side][distance])) != 0
+            column[hit] = distance
+    return result
+
+
+def evaluate(tensor):
+    """与 ai.evaluate 相同的局面评分（从行棋方角度），形状 (N,)"""
+    masks = piece_masks(tensor)
+    counts = _popcount(masks)
+    occ = _occupancy(masks)
+    per_side = counts @ VALUE_VECTOR
+    for side in (RED, BLUE):
+        per_side[:, side] += ADVANCE_BONUS * (MAX_DISTANCE * counts[:, side].sum(axis=1)
+                                              - _distance_sums(occ[:, side], side))
+    sign = np.where(tensor[:, PLANE_SIDE, 0, 0] == 0, 1, -1)
+    return sign * (per_side[:, RED] - per_side[:, BLUE])
+
+
+def move_mask_bits(tensor):
+    """行棋方各方向着法的起点位掩码，形状 (N, MOVE_PLANES)；算法与 BitBoard.legal_moves 相同"""
+    masks = piece_masks(tensor)
+    n = len(masks)
+    blue = tensor[:, PLANE_SIDE, 0, 0] != 0
+    own = np.where(blue[:, None], masks[:, BLUE], masks[:, RED])
+    enemy_pieces = np.where(blue[:, None], masks[:, RED], masks[:, BLUE])
+    own_occ = np.bitwise_or.reduce(own, axis=1)
+    enemy = np.bitwise_or.reduce(enemy_pieces, axis=1)
+    empty = _FULL & ~(own_occ | enemy)
+    rats = own[:, RAT - 1] | enemy_pieces[:, RAT - 1]
+    own_trap = np.where(blue, _TRAP[BLUE], _TRAP[RED])
+    enemy_trap = np.where(blue, _TRAP[RED], _TRAP[BLUE])
+    own_den = np.where(blue, _DEN[BLUE], _DEN[RED])
+    # 落入己方陷阱的对方棋子谁都能吃；身处对方陷阱的己方棋子只能吃这样的棋子
+    trapped_enemy = enemy & own_trap
+    water_ok = _FULL & ~own_den
+    land_ok = _LAND & water_ok
+
+    result = np.zeros((n, MOVE_PLANES), dtype=_U)
+    for t in range(1, TYPES + 1):
+        src = own[:, t - 1]
+        area = water_ok if t == RAT else land_ok
+        eat = trapped_enemy.copy()
+        for d in EATS[t]:
+            eat |= enemy_pieces[:, d - 1]
+        trapped = src & enemy_trap
+        groups = [(src ^ trapped, eat)]
+        # 身处对方陷阱的棋子很少见，整批都没有时跳过
+        if trapped.any():
+            groups.append((trapped, trapped_enemy))
+        for source, capt in groups:
+            dest = area & (empty | capt)
+            result[:, MOVE_UP] |= source & (dest << _SHIFT_ROW)
+            result[:, MOVE_DOWN] |= source & (dest >> _SHIFT_ROW)
+            result[:, MOVE_LEFT] |= source & _NOT_COL0 & (dest << _ONE)
+            result[:, MOVE_RIGHT] |= source & _NOT_COL6 & (dest >> _ONE)
+        if t == LION or t == TIGER:
+            # 陷阱都不在河边，身处陷阱的狮虎不可能跳河，只看第一组
+            source, capt = groups[0]
+            dest = area & (empty | capt)
+            for plane, sources, delta, offsets in JUMP_SHIFTS:
+                ok = source & sources & _shift(dest, delta)
+                for offset in offsets:
+                    ok &= ~_shift(rats, offset)
+                result[:, plane] |= ok
+    return result
+
+
+def move_masks(tensor):
+    """行棋方的着法掩码，形状 (N, MOVE_PLANES, 9, 7)，在起点格上标记
+
+    与 BitBoard.legal_moves 的规则一致（河流、陷阱、兽穴、吃子等级、鼠挡跳河），
+    但不检查局面是否已分出胜负。
+    """
+    return _planes(move_mask_bits(tensor)).astype(bool)
+
+
+def mask_to_moves(mask):
+    """把单个局面的着法掩码 (MOVE_PLANES, 9, 7) 转回 (起点格, 终点格) 列表"""
+    steps = {MOVE_UP: -COLS, MOVE_DOWN: COLS, MOVE_LEFT: -1, MOVE_RIGHT: 1}
+    jumps = {(plane, frm): to for plane, frm, to, _ in JUMP_MOVES}
+    moves = []
+    for plane, row, col in zip(*np.nonzero(mask)):
+        frm = square(int(row), int(col))
+        plane = int(plane)
+        to = frm + steps[plane] if plane in steps else jumps[(plane, frm)]
+        moves.append((frm, to))
+    return moves
@@ -0,0 +1,90 @@
+"""置换表：按Zobrist哈希缓存搜索结果，容量受内存上限约束"""
+
+# 结果类型：精确值、下界（发生beta截断）、上界（没有着法超过alpha）
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# 每个槽位的估计内存占用（64位键 + 条目元组 + 列表指针），用于把MB换算成槽位数
+SLOT_BYTES = 160
+
+
+class TranspositionTable:
+    """两路桶置换表
+
+    每个桶有两个槽位：第一个按深度优先替换，只有更深（或同一局面）的结果才能覆盖；
+    第二个总是替换，保存最近写入的结果。桶数取不超过内存上限的2的幂。
+    """
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        buckets = max(1, int(size_mb * 1024 * 1024) // (2 * SLOT_BYTES))
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.mask = self.bucket_count - 1
+        self.clear()
+
+    def clear(self):
+        slots = 2 * self.bucket_count
+        self.keys = [None] * slots
+        # 条目：(深度, 分数, 结果类型, 最佳着法)
+        self.entries = [None] * slots
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def probe(self, key):
+        """查找局面，命中返回 (深度, 分数, 结果类型, 最佳着法)，否则返回None"""
+        self.probes += 1
+        index = (key & self.mask) << 1
+        keys = self.keys
+        if keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+        if keys[index + 1] == key:
+            self.hits += 1
+            return self.entries[index + 1]
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        self.stores += 1
+        index = (key & self.mask) << 1
+        keys = self.keys
+        entries = self.entries
+        old_key = keys[index]
+        if old_key is None or old_key == key or depth >= entries[index][0]:
+            if old_key is not None and old_key != key:
+                self.replacements += 1
+                # 被挤出的深度优先条目降级到总是替换的槽位
+                keys[index + 1] = old_key
+                entries[index + 1] = entries[index]
+            keys[index] = key
+            entries[index] = (depth, score, flag, move)
+        else:
+            if keys[index + 1] is not None and keys[index + 1] != key:
+                self.replacements += 1
+            keys[index + 1] = key
+            entries[index + 1] = (depth, score, flag, move)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def usage(self):
+        """已占用槽位的比例"""
+        used = sum(1 for key in self.keys if key is not None)
+        return used / len(self.keys)
+
+    def stats(self):
+        return {
+            'size_mb': self.size_mb,
+            'buckets': self.bucket_count,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hit_rate(),
+            'stores': self.stores,
+            'replacements': self.replacements,
+            'usage': self.usage(),
+        }
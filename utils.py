@@ -1,6 +1,8 @@
+import json
 import os
 import pygame
 import sys
+import time
 
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径"""
@@ -11,8 +13,8 @@ def get_resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def load_image(file_path, size):
-    """加载图片文件并转换为指定大小的Pygame Surface对象"""
+def load_image(file_path, size=None):
+    """加载图片文件并转换为指定大小的Pygame Surface对象；size 为None时保持原始大小"""
     # 获取资源文件的实际路径
     actual_path = get_resource_path(file_path)
     if not os.path.exists(actual_path):
@@ -20,6 +22,15 @@ def load_image(file_path, size):
 
     # 加载图片并缩放到指定大小
     image = pygame.image.load(actual_path)
+    if size is None:
+        return image
+    return pygame.transform.scale(image, size)
+
+
+def smooth_scale(image, size):
+    """平滑缩放；smoothscale 只支持24位和32位图片，其他格式退回普通缩放"""
+    if image.get_bitsize() in (24, 32):
+        return pygame.transform.smoothscale(image, size)
     return pygame.transform.scale(image, size)
 
 def get_piece_image_path(piece_type, player):
@@ -37,4 +48,102 @@ def get_piece_image_path(piece_type, player):
     
     piece_name = piece_names[piece_type.name]
     # return os.path.join('images', f'{piece_name}.png')
-    return os.path.join('images', f'{piece_name}_{player}.png')
\ No newline at end of file
+    return os.path.join('images', f'{piece_name}_{player}.png')
+
+# 图集：build_atlas.py 把 images/ 下的图片统一缩放到 ATLAS_TILE 像素后拼成一张图，
+# 启动时只解码这一张 PNG；图集不存在时退回逐个加载原图
+ATLAS_IMAGE = os.path.join('images', 'atlas.png')
+ATLAS_INDEX = os.path.join('images', 'atlas.json')
+ATLAS_TILE = 160
+ATLAS_VERSION = 1
+
+
+def load_atlas():
+    """读取图集，返回 {图片名: Surface}；图集不存在或版本不符时返回None"""
+    image_path = get_resource_path(ATLAS_IMAGE)
+    index_path = get_resource_path(ATLAS_INDEX)
+    if not (os.path.exists(image_path) and os.path.exists(index_path)):
+        return None
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('version') != ATLAS_VERSION:
+        return None
+    sheet = pygame.image.load(image_path)
+    return {name: sheet.subsurface(pygame.Rect(rect)) for name, rect in index['sprites'].items()}
+
+
+# 中文字体：先检查常见字体文件，都没有时才让 pygame 扫描系统字体（Linux 上较慢），
+# 结果缓存到用户缓存目录，之后启动直接使用
+FONT_CANDIDATES = [
+    '/System/Library/Fonts/PingFang.ttc',
+    '/System/Library/Fonts/STHeiti Light.ttc',
+    'C:/Windows/Fonts/msyh.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/wenquanyi/wqy-microhei/wqy-microhei.ttc',
+]
+FONT_NAMES = 'pingfang,stheiti,simhei,microsoftyahei,notosanscjksc,notosanscjk,wenquanyimicrohei'
+
+
+def get_cache_path(name):
+    """用户缓存目录下本程序的文件路径"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'animalchess', name)
+
+
+def resolve_font_path():
+    """返回中文字体文件路径，找不到时返回None（使用 pygame 默认字体）
+
+    只缓存找到的字体；没找到时不写缓存，之后安装了中文字体下次启动就能用上。
+    """
+    cache_path = get_cache_path('font_path.txt')
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = f.read().strip()
+        # 缓存为空（旧版本记录的"没找到"）或字体已被删除时重新查找
+        if cached and os.path.exists(cached):
+            return cached
+    except OSError:
+        pass
+    path = next((p for p in FONT_CANDIDATES if os.path.exists(p)), None)
+    if path is None:
+        path = pygame.font.match_font(FONT_NAMES)
+    if path is None:
+        return None
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(path)
+    except OSError:
+        pass
+    return path
+
+
+class StartupTimer:
+    """记录启动各阶段的耗时"""
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        lines = ['启动耗时：']
+        for name, seconds in self.phases + [('合计', self.total())]:
+            # 中文字符按两格宽度对齐
+            width = sum(2 if ord(ch) > 127 else 1 for ch in name)
+            lines.append(f'  {name}{" " * (12 - width)}{seconds * 1000:8.1f} ms')
+        return '\n'.join(lines)